@@ -0,0 +1,107 @@
+"""Автодополнение ингредиентов по индексу в памяти процесса.
+
+Индекс - отсортированный список названий, поиск по префиксу делается
+бинарным поиском. Названия сравниваются без учёта регистра и лишних
+пробелов, а из записей, совпадающих после такой нормализации и по
+единице измерения, в индекс попадает одна - с меньшим id. Данные для
+построения берутся из версионируемого кэша справочника, поэтому обычный
+запрос к автодополнению не ходит в базу, а индекс перестраивается,
+когда меняется версия ингредиентов.
+"""
+import difflib
+import threading
+from bisect import bisect_left, bisect_right
+
+from recipe.models import IngredientsBd
+from .cache import INGREDIENTS_CACHE, get_or_build, get_version
+
+FUZZY_MIN_LENGTH = 3
+FUZZY_CUTOFF = 0.8
+
+
+def normalize(text):
+    return ' '.join(text.split()).lower()
+
+
+class IngredientIndex:
+    def __init__(self, ingredients):
+        self.items, self.keys = [], []
+        seen = set()
+        for item in sorted(ingredients, key=lambda item: (
+                normalize(item['name']), item['id'])):
+            key = normalize(item['name'])
+            unit = normalize(item['measurement_unit'])
+            if (key, unit) in seen:
+                continue
+            seen.add((key, unit))
+            self.items.append(item)
+            self.keys.append(key)
+        self.names = sorted(set(self.keys))
+
+    def prefix_range(self, query):
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + '\uffff', lo=start)
+        return start, end
+
+    def search(self, query, limit):
+        """Сначала совпадения по префиксу, затем по подстроке и похожие."""
+        query = normalize(query)
+        if not query:
+            return self.items[:limit]
+        start, end = self.prefix_range(query)
+        found = list(range(start, min(end, start + limit)))
+        if len(found) < limit:
+            found += self.substring_matches(query, limit - len(found))
+        if len(found) < limit and len(query) >= FUZZY_MIN_LENGTH:
+            found += self.fuzzy_matches(query, limit - len(found), found)
+        return [self.items[index] for index in found]
+
+    def substring_matches(self, query, limit):
+        ranked = []
+        for index, key in enumerate(self.keys):
+            position = key.find(query)
+            if position <= 0:
+                continue
+            word_start = key[position - 1] in ' -,('
+            ranked.append((not word_start, position, len(key), index))
+        ranked.sort()
+        return [index for *_, index in ranked[:limit]]
+
+    def fuzzy_matches(self, query, limit, exclude):
+        exclude = set(exclude)
+        matches = difflib.get_close_matches(
+            query, self.names, n=limit + len(exclude), cutoff=FUZZY_CUTOFF)
+        found = []
+        for key in matches:
+            # Одно название с разными единицами - несколько записей.
+            start = bisect_left(self.keys, key)
+            for index in range(start, bisect_right(self.keys, key, lo=start)):
+                if index not in exclude:
+                    found.append(index)
+                    exclude.add(index)
+        return found[:limit]
+
+
+_index = None
+_index_version = None
+_lock = threading.Lock()
+
+
+def load_catalogue():
+    return list(IngredientsBd.objects.values(
+        'id', 'name', 'measurement_unit'))
+
+
+def get_index():
+    """Индекс для текущей версии справочника ингредиентов."""
+    global _index, _index_version
+    version = get_version(INGREDIENTS_CACHE)
+    if _index_version == version:
+        return _index, version
+    with _lock:
+        if _index_version != version:
+            _index = IngredientIndex(get_or_build(
+                INGREDIENTS_CACHE, 'catalogue', load_catalogue,
+                version=version))
+            _index_version = version
+    return _index, version
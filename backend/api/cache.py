@@ -0,0 +1,89 @@
+"""Версионируемый двухуровневый кэш.
+
+Первый уровень - память процесса (кэш ``local``), второй - общий для всех
+воркеров кэш ``default``. Каждое пространство имён хранит в общем кэше
+номер версии: при изменении данных версия увеличивается, и старые записи
+на обоих уровнях просто перестают читаться.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import count_cache_lookup
+
+LOCAL_CACHE = 'local'
+SHARED_CACHE = 'default'
+
+TAGS_CACHE = 'tags'
+INGREDIENTS_CACHE = 'ingredients'
+RELATIONS_CACHE = 'relations'
+RECIPES_CACHE = 'recipes'
+TRENDING_CACHE = 'trending'
+
+
+def get_version_key(namespace):
+    return f'version:{namespace}'
+
+
+def initial_version():
+    # Версия от времени: после очистки общего кэша номера не повторятся,
+    # и в памяти процессов не найдутся старые записи с той же версией.
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    shared = caches[SHARED_CACHE]
+    key = get_version_key(namespace)
+    version = shared.get(key)
+    if version is None:
+        shared.add(key, initial_version(), timeout=None)
+        version = shared.get(key)
+    return version
+
+
+def get_versions(*namespaces):
+    """Версии нескольких пространств имён одним запросом к общему кэшу."""
+    keys = [get_version_key(namespace) for namespace in namespaces]
+    found = caches[SHARED_CACHE].get_many(keys)
+    return [found[key] if key in found else get_version(namespace)
+            for key, namespace in zip(keys, namespaces)]
+
+
+def bump_version(namespace):
+    shared = caches[SHARED_CACHE]
+    key = get_version_key(namespace)
+    try:
+        shared.incr(key)
+    except ValueError:
+        shared.set(key, initial_version(), timeout=None)
+
+
+def make_key(namespace, version, key):
+    digest = hashlib.md5(key.encode()).hexdigest()
+    return f'{namespace}:{version}:{digest}'
+
+
+def get_or_build(namespace, key, build, version=None, timeout=None):
+    """Значение из памяти процесса, затем из общего кэша, затем build()."""
+    if timeout is None:
+        timeout = settings.CATALOGUE_CACHE_TIMEOUT
+    if version is None:
+        version = get_version(namespace)
+    full_key = make_key(namespace, version, key)
+    local = caches[LOCAL_CACHE]
+    value = local.get(full_key)
+    if value is not None:
+        count_cache_lookup(namespace, 'local')
+        return value
+    shared = caches[SHARED_CACHE]
+    value = shared.get(full_key)
+    if value is None:
+        count_cache_lookup(namespace, 'miss')
+        value = build()
+        shared.set(full_key, value, timeout)
+    else:
+        count_cache_lookup(namespace, 'shared')
+    local.set(full_key, value, timeout)
+    return value
@@ -0,0 +1,69 @@
+"""Денормализованные счётчики рецептов и пользователей.
+
+Избранное, корзина и подписки меняют счётчики через F() в api.toggles,
+число рецептов автора - сигналы рецепта. Правки из админки и каскадные
+удаления счётчики не трогают: расхождения исправляет команда
+reconcile_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipe.models import FollowRecipes, Recipe, ShoppingCart
+from users.models import FollowAuthor, User
+
+# Модель связи: (поле объекта, модель объекта, счётчик объекта).
+RELATION_COUNTERS = {
+    FollowRecipes: ('recipes', Recipe, 'favorites_count'),
+    ShoppingCart: ('recipe', Recipe, 'in_carts_count'),
+    FollowAuthor: ('author', User, 'followers_count'),
+}
+
+# Счётчик: (модель, поле, модель строк, поле строк на объект).
+COUNTERS = (
+    (Recipe, 'favorites_count', FollowRecipes, 'recipes'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'followers_count', FollowAuthor, 'author'),
+    (User, 'recipes_count', Recipe, 'author'),
+)
+
+
+def change_counter(model, counter, ids, delta):
+    model.objects.filter(pk__in=ids).update(
+        **{counter: Greatest(F(counter) + delta, 0)})
+
+
+def relation_counted(model, ids, delta):
+    """Обновляет счётчик объектов, с которыми изменилась связь."""
+    if model in RELATION_COUNTERS and ids:
+        field, target, counter = RELATION_COUNTERS[model]
+        change_counter(target, counter, ids, delta)
+
+
+def count_by(rows, field):
+    return Coalesce(Subquery(
+        rows.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile(model, counter, rows, field, batch_size=1000):
+    """Пересчитывает счётчик и сохраняет только разошедшиеся значения.
+
+    Возвращает pk исправленных объектов.
+    """
+    stale = [
+        model(pk=pk, **{counter: actual})
+        for pk, actual in model.objects.annotate(
+            actual=count_by(rows, field)
+        ).exclude(**{counter: F('actual')}).values_list('pk', 'actual')
+    ]
+    model.objects.bulk_update(stale, (counter,), batch_size=batch_size)
+    return [obj.pk for obj in stale]
+
+
+def recount(model, counter, rows, field):
+    """Пересчитывает счётчик всех объектов одним UPDATE.
+
+    Для массовой загрузки, когда разошлись почти все значения.
+    """
+    return model.objects.update(**{counter: count_by(rows, field)})
@@ -0,0 +1,229 @@
+"""Синхронные представления API под ASGI.
+
+Django 3.2 выполняет синхронные представления под ASGI в одном общем
+потоке, а ORM асинхронных вызовов не поддерживает. Поэтому представления
+API в режиме ASYNC_VIEWS оборачиваются в async-функции, которые выполняют
+их в отдельном пуле из ASYNC_VIEWS_THREADS потоков: медленная загрузка
+картинки или выгрузка списка покупок занимает один поток пула, а не
+воркер целиком.
+
+В потоке пула отрисовывается ответ DRF. Потоковый ответ (выгрузка списка
+покупок) Django 3.2 перебирает прямо в цикле событий, а его генератор
+обращается к БД, поэтому PooledASGIHandler перебирает его в потоке пула
+и передаёт куски в цикл событий через короткую очередь: в памяти только
+несколько кусков, а не весь файл. Соединения с БД в потоках пула
+закрываются по тем же правилам, что и в обычном запросе
+(close_old_connections). Обёртки выполнения SQL метрик и профилирования
+передаются в поток пула через contextvar.
+"""
+import asyncio
+import contextvars
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from functools import partial, wraps
+
+import django
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connections
+
+query_wrappers = contextvars.ContextVar('query_wrappers', default=())
+
+# Куски потокового ответа между потоком пула и циклом событий.
+STREAM_QUEUE_SIZE = 4
+STREAM_END = object()
+
+executor = None
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_VIEWS_THREADS,
+            thread_name_prefix='api-view')
+    return executor
+
+
+@contextmanager
+def install_query_wrappers():
+    """Подключает обёртки SQL из contextvar к соединениям потока."""
+    with ExitStack() as stack:
+        for wrapper in query_wrappers.get():
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Обёртка SQL для текущего потока и потоков пула этого запроса."""
+    token = query_wrappers.set(query_wrappers.get() + (wrapper,))
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            yield
+    finally:
+        query_wrappers.reset(token)
+
+
+def render(response):
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return response
+
+
+def call_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        with install_query_wrappers():
+            return render(view(request, *args, **kwargs))
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(), partial(context.run, func, *args, **kwargs))
+
+
+def async_view(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_in_pool(call_view, view, request, *args, **kwargs)
+    return wrapper
+
+
+def async_patterns(patterns):
+    """URL-шаблоны с представлениями, выполняемыми в пуле потоков."""
+    if not settings.ASYNC_VIEWS:
+        return patterns
+    for pattern in patterns:
+        pattern.callback = async_view(pattern.callback)
+    return patterns
+
+
+class RequestMiddleware(ABC):
+    """Middleware вокруг обработки запроса, работает под WSGI и ASGI.
+
+    start() возвращает состояние запроса или None, если запрос не нужно
+    обрабатывать; get_query_wrapper() - обёртку выполнения SQL;
+    finish() получает ответ, end() вызывается всегда.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django узнаёт асинхронную middleware.
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        state = self.start(request)
+        if state is None:
+            return self.get_response(request)
+        try:
+            with wrap_queries(self.get_query_wrapper(state)):
+                response = self.get_response(request)
+        finally:
+            self.end(state)
+        return self.finish(request, response, state)
+
+    async def acall(self, request):
+        state = self.start(request)
+        if state is None:
+            return await self.get_response(request)
+        try:
+            with wrap_queries(self.get_query_wrapper(state)):
+                response = await self.get_response(request)
+        finally:
+            self.end(state)
+        return self.finish(request, response, state)
+
+    @abstractmethod
+    def start(self, request):
+        pass
+
+    @abstractmethod
+    def get_query_wrapper(self, state):
+        pass
+
+    @abstractmethod
+    def finish(self, request, response, state):
+        pass
+
+    def end(self, state):
+        pass
+
+
+def produce_stream(response, loop, queue, stop):
+    """Перебирает потоковый ответ в потоке пула и кладёт куски в queue."""
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    close_old_connections()
+    try:
+        for part in response:
+            if stop.is_set():
+                break
+            put(part)
+    except Exception as error:
+        put(error)
+    finally:
+        # close() отправляет request_finished: соединение с БД потока
+        # закрывается как в конце обычного запроса.
+        response.close()
+        put(STREAM_END)
+
+
+class PooledASGIHandler(ASGIHandler):
+    """ASGIHandler, который перебирает потоковые ответы в пуле потоков."""
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        headers = [
+            (header.encode('ascii'), value.encode('latin1'))
+            for header, value in response.items()
+        ]
+        headers += [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        ]
+        await send({'type': 'http.response.start',
+                    'status': response.status_code,
+                    'headers': headers})
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        stop = threading.Event()
+        loop.run_in_executor(
+            get_executor(), produce_stream, response, loop, queue, stop)
+        item = None
+        try:
+            while (item := await queue.get()) is not STREAM_END:
+                if isinstance(item, Exception):
+                    raise item
+                for chunk, _ in self.chunk_bytes(item):
+                    await send({'type': 'http.response.body',
+                                'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body'})
+        finally:
+            # Клиент отключился или генератор упал: поток пула не должен
+            # остаться ждать места в очереди.
+            stop.set()
+            while item is not STREAM_END:
+                item = await queue.get()
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return PooledASGIHandler()
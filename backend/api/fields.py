@@ -0,0 +1,88 @@
+import io
+
+from django.conf import settings
+from drf_extra_fields.fields import Base64FieldMixin
+from PIL import Image
+from rest_framework.fields import Field, FileField
+from rest_framework.serializers import ValidationError
+
+from recipe.images import get_rendition
+from .profiling import section
+
+# Формат Pillow -> расширение
+IMAGE_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
+# Действия со списками рецептов: картинки меньшего размера
+LIST_ACTIONS = ('list', 'feed')
+
+
+class QueuedBase64ImageField(Base64FieldMixin, FileField):
+    """Картинка в base64, которая сохраняется без декодирования.
+
+    Pillow читает только заголовок файла: формат и размеры. Пиксели
+    декодируются позже обработчиком очереди картинок, который строит копии.
+    """
+    ALLOWED_TYPES = ('jpg', 'png', 'gif', 'webp')
+    INVALID_FILE_MESSAGE = 'Загрузите корректное изображение.'
+    INVALID_TYPE_MESSAGE = 'Не удалось определить формат изображения.'
+    TOO_LARGE_MESSAGE = 'Изображение слишком большое.'
+
+    def to_internal_value(self, data):
+        max_size = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        if isinstance(data, str) and len(data) * 3 // 4 > max_size:
+            raise ValidationError(self.TOO_LARGE_MESSAGE)
+        with section('image'):
+            return super().to_internal_value(data)
+
+    def get_file_extension(self, filename, decoded_file):
+        # Image.open ленивый: разбирает заголовок, но не пиксели.
+        try:
+            with Image.open(io.BytesIO(decoded_file)) as image:
+                image_format = image.format
+        except (OSError, SyntaxError, ValueError,
+                Image.DecompressionBombError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        return IMAGE_FORMATS.get(image_format)
+
+
+class RecipeImageField(Field):
+    """Ссылка на копию картинки рецепта подходящего размера.
+
+    Если размер не задан, для списка рецептов берётся
+    RECIPE_IMAGE_LIST_SIZE, для карточки - RECIPE_IMAGE_DETAIL_SIZE.
+    Пока копии не готовы, JPEG-поле отдаёт исходную картинку, а остальные
+    форматы - null.
+    """
+
+    def __init__(self, size=None, image_format='jpeg', **kwargs):
+        self.size = size
+        self.image_format = image_format
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_size(self):
+        if self.size:
+            return self.size
+        view = self.context.get('view')
+        if view is not None and getattr(view, 'action', None) in LIST_ACTIONS:
+            return settings.RECIPE_IMAGE_LIST_SIZE
+        return settings.RECIPE_IMAGE_DETAIL_SIZE
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        rendition = get_rendition(recipe, self.get_size(), self.image_format)
+        if rendition is not None:
+            url = rendition.image.url
+        elif self.image_format == 'jpeg':
+            url = recipe.image.url
+        else:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
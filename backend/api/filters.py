@@ -1,6 +1,56 @@
+from django.db.models import Count, Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
 from recipe.models import Recipe, Tag, IngredientsBd
+from recipe.search import SEARCH_RANK, search
+from .cache import TAGS_CACHE, get_or_build
+from .relations import INLINE_IDS_LIMIT, UserRelationSet
+
+TAGS_MODE_ANY = 'any'
+TAGS_MODE_ALL = 'all'
+TAGS_MODES = (
+    (TAGS_MODE_ANY, 'Любой из тегов'),
+    (TAGS_MODE_ALL, 'Все теги'),
+)
+
+ORDERING_NEWEST = 'newest'
+ORDERING_POPULAR = 'popular'
+ORDERING_TRENDING = 'trending'
+ORDERING_CHOICES = (
+    (ORDERING_NEWEST, 'Сначала новые'),
+    (ORDERING_POPULAR, 'Больше всего в избранном'),
+    (ORDERING_TRENDING, 'Популярные за последние дни'),
+)
+# Каждому порядку соответствует индекс recipe_*_idx.
+RECIPE_ORDERINGS = {
+    ORDERING_NEWEST: ('-pub_date', '-id'),
+    ORDERING_POPULAR: ('-favorites_count', '-id'),
+    ORDERING_TRENDING: ('-trending_score', '-id'),
+}
+
+
+# Без явного ordering результаты поиска идут по релевантности.
+SEARCH_ORDERING = (f'-{SEARCH_RANK}', '-id')
+
+
+def get_recipe_ordering(request):
+    ordering = request.query_params.get('ordering')
+    if ordering in RECIPE_ORDERINGS:
+        return RECIPE_ORDERINGS[ordering]
+    if request.query_params.get('search', '').strip():
+        return SEARCH_ORDERING
+    return RECIPE_ORDERINGS[ORDERING_NEWEST]
+
+
+def get_tag_map():
+    """slug -> id из кэша справочника тегов."""
+    return get_or_build(
+        TAGS_CACHE, 'slug_map',
+        lambda: dict(Tag.objects.values_list('slug', 'id')))
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_map()]
 
 
 class IngredientsBdFilter(FilterSet):
@@ -12,10 +62,19 @@ class IngredientsBdFilter(FilterSet):
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='filter_tags',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=TAGS_MODES,
+        method='filter_tags_mode',
+    )
+    # Объявлен раньше ordering, чтобы явный порядок заменял релевантность.
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=ORDERING_CHOICES,
+        method='filter_ordering',
     )
 
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
@@ -26,14 +85,47 @@ class RecipeFilter(FilterSet):
         model = Recipe
         fields = ('tags', 'author',)
 
+    def filter_tags(self, queryset, name, value):
+        """Теги одним подзапросом, без JOIN и DISTINCT по рецептам."""
+        tag_map = get_tag_map()
+        tag_ids = {tag_map[slug] for slug in value}
+        recipe_tags = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+        mode = self.form.cleaned_data.get('tags_mode')
+        if mode == TAGS_MODE_ALL and len(tag_ids) > 1:
+            return queryset.filter(id__in=recipe_tags.values(
+                'recipe_id'
+            ).annotate(
+                matched=Count('tag_id')
+            ).filter(
+                matched=len(tag_ids)
+            ).values('recipe_id'))
+        return queryset.filter(
+            Exists(recipe_tags.filter(recipe_id=OuterRef('pk'))))
+
+    def filter_tags_mode(self, queryset, name, value):
+        # Режим учитывается в filter_tags.
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search(queryset, value).order_by(*SEARCH_ORDERING)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
-        if value and not user.is_anonymous:
-            return queryset.filter(follow_recipes__user=user)
-        return queryset
+        if not value or user.is_anonymous:
+            return queryset
+        ids = UserRelationSet.for_request(self.request).favorites
+        if len(ids) <= INLINE_IDS_LIMIT:
+            return queryset.filter(id__in=ids)
+        return queryset.filter(follow_recipes__user=user)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
-        if value and not user.is_anonymous:
-            return queryset.filter(shopping_cart__user=user)
-        return queryset
+        if not value or user.is_anonymous:
+            return queryset
+        ids = UserRelationSet.for_request(self.request).cart
+        if len(ids) <= INLINE_IDS_LIMIT:
+            return queryset.filter(id__in=ids)
+        return queryset.filter(shopping_cart__user=user)
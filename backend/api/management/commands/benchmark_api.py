@@ -0,0 +1,221 @@
+"""Число запросов к БД, задержка и размер ответа основных эндпоинтов.
+
+Команда создаёт отдельную тестовую базу (для SQLite - в памяти, поэтому
+замер можно запустить без PostgreSQL: DB_ENGINE=django.db.backends.sqlite3),
+заполняет её синтетическими данными и запрашивает каждый эндпоинт через
+тестовый клиент. Число запросов считается дважды: с пустыми кэшами и на
+повторном запросе. Если оно выросло относительно сохранённого эталона,
+команда завершается ошибкой; --update-baseline перезаписывает эталон.
+"""
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.test import APIClient
+
+from api.cache import LOCAL_CACHE, SHARED_CACHE
+from api.counters import COUNTERS, reconcile
+from recipe.models import (FollowRecipes, IngredientsBd, IngredientsRecipe,
+                           ShoppingCart, Tag)
+from recipe.synthetic import BENCHMARK_PREFIX, SyntheticDataset
+from users.models import FollowAuthor, User
+
+BASELINE_PATH = os.path.join(
+    settings.BASE_DIR, 'data', 'benchmark_baseline.json')
+DATASET_OPTIONS = ('users', 'recipes', 'ingredients', 'ingredients_per_recipe',
+                   'favorites', 'carts', 'follows', 'seed')
+QUERY_METRICS = ('queries_cold', 'queries_warm')
+# Кэши в памяти процесса: замер очищает их и не должен задеть memcached.
+BENCHMARK_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'benchmark-{alias}'}
+    for alias in (SHARED_CACHE, LOCAL_CACHE)
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def read_content(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def clear_caches():
+    caches[SHARED_CACHE].clear()
+    caches[LOCAL_CACHE].clear()
+
+
+class Command(BaseCommand):
+    help = 'Замеряет запросы к БД, задержку и размер ответов API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=5000)
+        parser.add_argument('--carts', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--baseline', default=BASELINE_PATH)
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Сохранить число запросов как новый эталон.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self.report(results, options['repeat'])
+        dataset = {name: options[name] for name in DATASET_OPTIONS}
+        if options['update_baseline']:
+            self.save_baseline(options['baseline'], dataset, results)
+        else:
+            self.check_baseline(options['baseline'], dataset, results)
+
+    def create_data(self, options):
+        self.stdout.write('Создаю синтетические данные...')
+        dataset = SyntheticDataset(
+            prefix=BENCHMARK_PREFIX,
+            **{name: options[name] for name in DATASET_OPTIONS})
+        users, recipes = dataset.generate()
+        reader = users[0]
+        # У читателя всегда есть подписки, избранное и корзина.
+        FollowAuthor.objects.bulk_create(
+            [FollowAuthor(user_id=reader, author_id=author)
+             for author in users[1:11]],
+            ignore_conflicts=True)
+        FollowRecipes.objects.bulk_create(
+            [FollowRecipes(user_id=reader, recipes_id=recipe)
+             for recipe in recipes[:10]],
+            ignore_conflicts=True)
+        ShoppingCart.objects.bulk_create(
+            [ShoppingCart(user_id=reader, recipe_id=recipe)
+             for recipe in recipes[:10]],
+            ignore_conflicts=True)
+        # bulk_create не меняет денормализованные счётчики.
+        for model, counter, rows, field in COUNTERS:
+            reconcile(model, counter, rows, field)
+        return User.objects.get(id=reader), recipes
+
+    def get_endpoints(self, recipes):
+        recipe = IngredientsRecipe.objects.filter(
+            recipe_id__in=recipes).values_list('recipe_id', flat=True)[0]
+        tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+        ingredient = IngredientsBd.objects.values_list('name', flat=True)[0]
+        return {
+            'recipes_list': ('/api/recipes/', {}),
+            'recipes_list_anonymous': ('/api/recipes/', {}),
+            'recipes_list_filtered': (
+                '/api/recipes/', {'tags': tags, 'is_favorited': 1}),
+            'recipes_list_cursor': (
+                '/api/recipes/', {'pagination': 'cursor'}),
+            'recipes_detail': (f'/api/recipes/{recipe}/', {}),
+            'subscriptions': ('/api/users/subscriptions/', {}),
+            'ingredients': ('/api/ingredients/', {'name': ingredient[:3]}),
+            'tags': ('/api/tags/', {}),
+            'download_shopping_cart': (
+                '/api/recipes/download_shopping_cart/', {}),
+        }
+
+    def request(self, client, path, params):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = client.get(path, params)
+            content = read_content(response)
+            elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code != 200:
+            raise CommandError(
+                f'{path}: статус {response.status_code}: {content[:200]}')
+        return len(context.captured_queries), elapsed, len(content)
+
+    def run(self, options):
+        reader, recipes = self.create_data(options)
+        authenticated = APIClient()
+        authenticated.force_authenticate(reader)
+        anonymous = APIClient()
+        results = {}
+        for name, (path, params) in self.get_endpoints(recipes).items():
+            client = anonymous if name.endswith('_anonymous') else (
+                authenticated)
+            clear_caches()
+            cold, _, size = self.request(client, path, params)
+            timings = []
+            for _ in range(options['repeat']):
+                warm, elapsed, _ = self.request(client, path, params)
+                timings.append(elapsed)
+            results[name] = {
+                'queries_cold': cold,
+                'queries_warm': warm,
+                'p50_ms': percentile(timings, 0.5),
+                'p95_ms': percentile(timings, 0.95),
+                'bytes': size,
+            }
+        return results
+
+    def report(self, results, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'=== Запросы (холодный / повторный), мс p50 / p95 '
+            f'({repeat} повторов), байт'))
+        for name, result in results.items():
+            self.stdout.write(
+                f'  {name}: {result["queries_cold"]} / '
+                f'{result["queries_warm"]}, {result["p50_ms"]:.2f} / '
+                f'{result["p95_ms"]:.2f}, {result["bytes"]}')
+
+    def save_baseline(self, path, dataset, results):
+        baseline = {
+            'dataset': dataset,
+            'endpoints': {
+                name: {metric: result[metric] for metric in QUERY_METRICS}
+                for name, result in results.items()
+            },
+        }
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write('\n')
+        self.stdout.write(f'Эталон сохранён в {path}')
+
+    def check_baseline(self, path, dataset, results):
+        try:
+            with open(path, encoding='utf-8') as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            raise CommandError(
+                f'Нет эталона {path}, запустите с --update-baseline')
+        if baseline['dataset'] != dataset:
+            self.stdout.write(self.style.WARNING(
+                'Параметры данных отличаются от эталонных, число запросов '
+                'может не совпасть.'))
+        regressions = [
+            f'{name}.{metric}: {result[metric]} > {expected[metric]}'
+            for name, result in results.items()
+            for expected in [baseline['endpoints'].get(name)] if expected
+            for metric in QUERY_METRICS
+            if result[metric] > expected[metric]
+        ]
+        if regressions:
+            raise CommandError(
+                'Число запросов выросло: ' + '; '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(
+            'Число запросов не превышает эталон.'))
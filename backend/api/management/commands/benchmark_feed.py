@@ -0,0 +1,114 @@
+"""Сравнение ленты подписок по подзапросу и материализованной ленты.
+
+Все данные создаются в транзакции и откатываются. Читатель подписан на
+--following авторов, один из них - «звезда» с --followers подписчиками:
+на ней замеряется стоимость fan-out при публикации рецепта.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from recipe import feed
+from recipe.models import Recipe
+from recipe.synthetic import BENCHMARK_PREFIX, SyntheticDataset
+from users.models import FollowAuthor, User
+
+PAGE_SIZE = 6
+
+
+class Rollback(Exception):
+    pass
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+class Command(BaseCommand):
+    help = 'Замеряет ленту подписок: выборка по подпискам против fan-out.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=10000)
+        parser.add_argument('--following', type=int, default=500)
+        parser.add_argument('--recipes-per-author', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Изменения откатены.')
+
+    def create_data(self, options):
+        dataset = SyntheticDataset(
+            users=options['followers'] + 2,
+            recipes=options['following'] * options['recipes_per_author'],
+            seed=options['seed'],
+            prefix=BENCHMARK_PREFIX,
+        )
+        users = dataset.create_users()
+        reader, star = users[0], users[1]
+        authors = users[1:options['following'] + 1]
+        dataset.create_recipes(authors)
+        follows = [FollowAuthor(user_id=reader, author_id=author)
+                   for author in authors]
+        follows += [FollowAuthor(user_id=user, author_id=star)
+                    for user in users[2:]]
+        FollowAuthor.objects.bulk_create(follows, batch_size=1000)
+        return User.objects.get(id=reader), User.objects.get(id=star)
+
+    def run(self, options):
+        self.stdout.write('Создаю синтетические данные...')
+        reader, star = self.create_data(options)
+        repeat = options['repeat']
+        with override_settings(FEED_MATERIALIZED=True):
+            start = time.perf_counter()
+            entries = feed.rebuild()
+            rebuild_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(
+            f'Материализация: {entries} записей за {rebuild_ms:.0f} мс')
+
+        queries = {}
+        for materialized in (False, True):
+            queryset = feed.get_feed(Recipe.objects.all(), reader,
+                                     materialized)
+            date = feed.FEED_PUB_DATE if materialized else 'pub_date'
+            queryset = queryset.order_by(f'-{date}', '-id')
+            middle = queryset[queryset.count() // 2]
+            deep = queryset.filter(
+                **{f'{date}__lt': getattr(middle, date)})
+            name = 'fan-out' if materialized else 'подзапрос'
+            queries[f'{name}: первая страница'] = queryset
+            queries[f'{name}: страница из середины'] = deep
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'=== Чтение, мс (медиана / максимум, {repeat} повторов)'))
+        for name, queryset in queries.items():
+            median, worst = measure(
+                lambda: list(queryset.all()[:PAGE_SIZE]), repeat)
+            self.stdout.write(f'  {name}: {median:.2f} / {worst:.2f}')
+
+        recipes = [
+            Recipe.objects.create(author=star, name=f'Новый рецепт {i}',
+                                  text='Замер fan-out.', cooking_time=10)
+            for i in range(repeat)
+        ]
+        with override_settings(FEED_MATERIALIZED=True):
+            median, worst = measure(
+                lambda: feed.fan_out(recipes.pop()), repeat)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'=== Публикация у автора с {options["followers"]} '
+            f'подписчиками, мс'))
+        self.stdout.write('  подзапрос: запись в ленты не нужна')
+        self.stdout.write(f'  fan-out: {median:.2f} / {worst:.2f}')
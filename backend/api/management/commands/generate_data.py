@@ -0,0 +1,94 @@
+"""Синтетические данные для нагрузочного тестирования.
+
+Ингредиенты и теги загружаются из data/ (import_catalogue), пользователи,
+рецепты, избранное, корзины и подписки создаются SyntheticDataset с
+распределением Ципфа. После вставки пересчитываются счётчики, поисковые
+векторы и, если включена, материализованная лента: bulk_create их не
+обновляет. Популярность за последние дни посчитает update_trending.
+
+Один и тот же --seed даёт одни и те же данные, но повторно в одну базу
+его загрузить нельзя.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import RECIPES_CACHE, bump_version
+from api.counters import COUNTERS, recount
+from recipe import feed
+from recipe.search import update_search_vectors
+from recipe.synthetic import PREFIX, SyntheticDataset
+from users.models import User
+
+TAGS_DATA_PATH = os.path.join(settings.BASE_DIR, 'data', 'tags.json')
+
+
+class Command(BaseCommand):
+    help = 'Создаёт пользователей, рецепты и связи для нагрузочных тестов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=500000)
+        parser.add_argument('--carts', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=100000)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения Ципфа; 0 - равномерно.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--ingredients', default=settings.INGREDIENTS_DATA_PATH)
+        parser.add_argument('--tags', default=TAGS_DATA_PATH)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(
+                username__startswith=f'{PREFIX}{options["seed"]}_').exists():
+            raise CommandError(
+                f'Данные с --seed {options["seed"]} уже загружены.')
+        self.started = time.perf_counter()
+        call_command('import_catalogue', ingredients=options['ingredients'],
+                     tags=options['tags'], verbosity=0)
+        self.step('справочники')
+        dataset = SyntheticDataset(
+            users=options['users'],
+            recipes=options['recipes'],
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            follows=options['follows'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            zipf=options['zipf'],
+            catalogue=True,
+        )
+        with transaction.atomic():
+            self.generate(dataset)
+        bump_version(RECIPES_CACHE)
+
+    def step(self, title):
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'[{elapsed:7.1f} с] {title}')
+
+    def generate(self, dataset):
+        users = dataset.create_users()
+        self.step(f'пользователи: {len(users)}')
+        recipes = dataset.create_recipes(users)
+        self.step(f'рецепты: {len(recipes)}')
+        dataset.create_recipe_relations(
+            recipes, dataset.create_ingredients(), dataset.create_tags())
+        self.step('ингредиенты и теги рецептов')
+        dataset.create_user_relations(users, recipes)
+        self.step('избранное, корзины и подписки')
+        for model, counter, rows, field in COUNTERS:
+            recount(model, counter, rows, field)
+        self.step('счётчики')
+        update_search_vectors()
+        if feed.is_materialized():
+            feed.rebuild()
+        self.step('поисковые векторы и лента')
@@ -0,0 +1,157 @@
+"""Идемпотентная загрузка справочников ингредиентов и тегов.
+
+Ингредиенты читаются из CSV (name,measurement_unit) или JSON и
+группируются по названию: одно название может встречаться с разными
+единицами измерения. Для каждой пачки названий одним запросом
+выбираются уже существующие записи. Если у названия в базе есть
+единица, которой больше нет в файле, а в файле - новая, запись получает
+новую единицу (bulk_update); остальные новые пары добавляются одним
+bulk_create. Теги определяются slug, у них обновляются name и color.
+Существующие записи никогда не удаляются, поэтому рецепты со ссылками
+на них не страдают.
+"""
+import csv
+import json
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.cache import INGREDIENTS_CACHE, TAGS_CACHE, bump_version
+from recipe.models import IngredientsBd, Tag
+
+CSV_HEADER = ('name', 'measurement_unit')
+TAG_FIELDS = ('name', 'color')
+
+
+class DryRunRollback(Exception):
+    pass
+
+
+def read_ingredients(path):
+    _, extension = os.path.splitext(path)
+    with open(path, encoding='utf-8') as file:
+        if extension == '.json':
+            for item in json.load(file):
+                yield item['name'].strip(), item['measurement_unit'].strip()
+            return
+        for row in csv.reader(file):
+            if not row or tuple(row[:2]) == CSV_HEADER:
+                continue
+            yield row[0].strip(), row[1].strip()
+
+
+def group_units(pairs):
+    """Название -> единицы измерения в порядке файла, без повторов."""
+    units = {}
+    for name, unit in pairs:
+        units.setdefault(name, {})[unit] = None
+    return {name: list(found) for name, found in units.items()}
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты и теги без удаления существующих записей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients', default=settings.INGREDIENTS_DATA_PATH,
+            help='CSV или JSON с ингредиентами.')
+        parser.add_argument(
+            '--tags', help='JSON со списком тегов (name, color, slug).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Показать изменения, ничего не записывая.')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        try:
+            with transaction.atomic():
+                if options['ingredients']:
+                    self.import_ingredients(
+                        options['ingredients'], options['batch_size'])
+                if options['tags']:
+                    self.import_tags(options['tags'])
+                if self.dry_run:
+                    raise DryRunRollback
+        except DryRunRollback:
+            self.stdout.write('Пробный запуск: изменения не сохранены.')
+        except (OSError, KeyError, IndexError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать данные: {error}')
+
+    def report(self, title, inserted, updated, unchanged):
+        self.stdout.write(self.style.SUCCESS(
+            f'{title}: добавлено {inserted}, обновлено {updated}, '
+            f'без изменений {unchanged}'))
+
+    def show(self, line):
+        if self.dry_run or self.verbosity > 1:
+            self.stdout.write(line)
+
+    def import_ingredients(self, path, batch_size):
+        inserted = updated = unchanged = 0
+        units = group_units(read_ingredients(path))
+        for batch in batches(units, batch_size):
+            existing = {}
+            for ingredient in IngredientsBd.objects.filter(name__in=batch):
+                existing.setdefault(ingredient.name, {})[
+                    ingredient.measurement_unit] = ingredient
+            new, changed = [], []
+            for name in batch:
+                rows = existing.get(name, {})
+                missing = [unit for unit in units[name] if unit not in rows]
+                stale = [row for unit, row in rows.items()
+                         if unit not in units[name]]
+                unchanged += len(units[name]) - len(missing)
+                for row, unit in zip(stale, missing):
+                    self.show(f'~ {name}: {row.measurement_unit!r} -> '
+                              f'{unit!r}')
+                    row.measurement_unit = unit
+                    changed.append(row)
+                for unit in missing[len(stale):]:
+                    self.show(f'+ {name} ({unit})')
+                    new.append(IngredientsBd(
+                        name=name, measurement_unit=unit))
+            IngredientsBd.objects.bulk_create(new)
+            IngredientsBd.objects.bulk_update(changed, ('measurement_unit',))
+            inserted += len(new)
+            updated += len(changed)
+        if inserted or updated:
+            transaction.on_commit(lambda: bump_version(INGREDIENTS_CACHE))
+        self.report('Ингредиенты', inserted, updated, unchanged)
+
+    def import_tags(self, path):
+        with open(path, encoding='utf-8') as file:
+            items = {item['slug']: item for item in json.load(file)}
+        existing = Tag.objects.in_bulk(items, field_name='slug')
+        new, changed = [], []
+        for slug, item in items.items():
+            tag = existing.get(slug)
+            if tag is None:
+                self.show(f'+ {slug}')
+                new.append(Tag(slug=slug, **{
+                    field: item[field] for field in TAG_FIELDS}))
+                continue
+            differs = [field for field in TAG_FIELDS
+                       if getattr(tag, field) != item[field]]
+            for field in differs:
+                self.show(f'~ {slug}: {field} {getattr(tag, field)!r} -> '
+                          f'{item[field]!r}')
+                setattr(tag, field, item[field])
+            if differs:
+                changed.append(tag)
+        Tag.objects.bulk_create(new)
+        Tag.objects.bulk_update(changed, TAG_FIELDS)
+        if new or changed:
+            transaction.on_commit(lambda: bump_version(TAGS_CACHE))
+        self.report('Теги', len(new), len(changed),
+                    len(items) - len(new) - len(changed))
@@ -0,0 +1,136 @@
+"""Нагрузка смешанными медленными и быстрыми запросами.
+
+Параллельные клиенты в течение --duration секунд запрашивают запущенный
+сервер: доля --slow-share запросов - медленные (по умолчанию выгрузка
+списка покупок в PDF), остальные - быстрые (список тегов). С
+--upload-kb медленный запрос - это загрузка рецепта с картинкой такого
+размера со скоростью --upload-kbps, как у клиента на плохой связи;
+рецепт не создаётся, ответ 400 тоже считается. Для каждого вида
+выводятся число ответов, ошибки, запросы в секунду и задержки.
+
+Сравнение WSGI и ASGI на одних данных:
+
+    gunicorn backend.wsgi -w 2
+    gunicorn backend.asgi -w 2 -k uvicorn.workers.UvicornWorker
+
+и для каждого ``python manage.py load_test --token <токен>``.
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+from requests.exceptions import RequestException
+
+from .benchmark_api import percentile
+
+SLOW = 'медленные'
+FAST = 'быстрые'
+UPLOAD_CHUNK = 1024
+
+
+class SlowBody:
+    """Тело запроса, которое отдаётся по килобайту с паузами."""
+
+    def __init__(self, size_kb, kbps):
+        # Без остальных полей рецепт не пройдёт проверку и не создастся.
+        self.data = ('{"image": "data:image/png;base64,'
+                     + 'A' * (size_kb * 1024) + '"}').encode()
+        self.delay = 1 / kbps
+        self.position = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def read(self, size=-1):
+        if self.position >= len(self.data):
+            return b''
+        time.sleep(self.delay)
+        chunk = self.data[self.position:self.position + UPLOAD_CHUNK]
+        self.position += len(chunk)
+        return chunk
+
+
+class Command(BaseCommand):
+    help = 'Нагружает сервер смесью медленных и быстрых запросов.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--token', help='Токен пользователя с непустой корзиной.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=20)
+        parser.add_argument('--slow-share', type=float, default=0.2)
+        parser.add_argument(
+            '--slow-path',
+            default='/api/recipes/download_shopping_cart/?type=pdf')
+        parser.add_argument('--fast-path', default='/api/tags/')
+        parser.add_argument('--upload-kb', type=int, default=0)
+        parser.add_argument('--upload-kbps', type=float, default=100)
+        parser.add_argument('--upload-path', default='/api/recipes/')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        paths = {
+            SLOW: options['url'] + options['slow_path'],
+            FAST: options['url'] + options['fast_path'],
+        }
+        upload_url = options['url'] + options['upload_path']
+        deadline = time.monotonic() + options['duration']
+        results = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+
+        def request(session, kind):
+            if kind == FAST or not options['upload_kb']:
+                return session.get(paths[kind], timeout=60).status_code != 200
+            response = session.post(
+                upload_url, timeout=60,
+                data=SlowBody(options['upload_kb'], options['upload_kbps']),
+                headers={'Content-Type': 'application/json'})
+            return response.status_code >= 500
+
+        def client(number):
+            rng = random.Random(options['seed'] + number)
+            session = requests.Session()
+            session.headers.update(headers)
+            while time.monotonic() < deadline:
+                kind = SLOW if rng.random() < options['slow_share'] else FAST
+                start = time.perf_counter()
+                try:
+                    failed = request(session, kind)
+                except RequestException:
+                    failed = True
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    if failed:
+                        errors[kind] += 1
+                    else:
+                        results[kind].append(elapsed)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            list(pool.map(client, range(options['concurrency'])))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'=== {options["concurrency"]} клиентов, {elapsed:.0f} с: '
+            f'ответов, ошибок, запросов/с, мс p50 / p95 / p99'))
+        for kind in (FAST, SLOW):
+            timings = results[kind]
+            if not timings:
+                self.stdout.write(f'  {kind}: ответов нет, '
+                                  f'ошибок {errors[kind]}')
+                continue
+            self.stdout.write(
+                f'  {kind}: {len(timings)}, {errors[kind]}, '
+                f'{len(timings) / elapsed:.1f}, '
+                f'{percentile(timings, 0.5):.0f} / '
+                f'{percentile(timings, 0.95):.0f} / '
+                f'{percentile(timings, 0.99):.0f}')
@@ -0,0 +1,43 @@
+"""Сверка денормализованных счётчиков с данными.
+
+Запускается периодически (например, из cron): счётчики меняются
+инкрементами и могут разойтись после правок в админке, каскадных
+удалений или прерванных запросов. После исправления кэш ответов
+анонимам сбрасывается для авторов затронутых рецептов и профилей.
+"""
+from django.core.management.base import BaseCommand
+
+from api.counters import COUNTERS, reconcile
+from api.response_cache import invalidate_recipes
+from recipe.models import Recipe
+
+
+def get_authors(model, pks, batch_size):
+    if model is not Recipe:
+        return set(pks)
+    authors = set()
+    for start in range(0, len(pks), batch_size):
+        authors.update(Recipe.objects.filter(
+            pk__in=pks[start:start + batch_size]
+        ).values_list('author_id', flat=True))
+    return authors
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, корзин, подписчиков и рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        authors = set()
+        for model, counter, rows, field in COUNTERS:
+            fixed = reconcile(model, counter, rows, field,
+                              batch_size=batch_size)
+            authors |= get_authors(model, fixed, batch_size)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}.{counter}: '
+                f'исправлено {len(fixed)}')
+        if authors:
+            invalidate_recipes(*authors)
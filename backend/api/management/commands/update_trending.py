@@ -0,0 +1,23 @@
+"""Пересчёт Recipe.trending_score для сортировки ordering=trending.
+
+Запускается периодически, например раз в 10-15 минут из cron. Новые
+оценки сбрасывают только кэшированные ответы с ordering=trending, в том
+числе списки рецептов одного автора.
+"""
+from django.core.management.base import BaseCommand
+
+from api.cache import TRENDING_CACHE, bump_version
+from recipe.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает популярность рецептов за последние дни.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        changed = update_trending(batch_size=options['batch_size'])
+        if changed:
+            bump_version(TRENDING_CACHE)
+        self.stdout.write(f'Обновлено рецептов: {changed}')
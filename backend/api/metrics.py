@@ -0,0 +1,305 @@
+"""Метрики API в текстовом формате Prometheus.
+
+MetricsMiddleware считает запросы, их длительность и число SQL-запросов
+по действиям представлений (RecipeViewSet.list, CustomUserViewSet.
+subscriptions и т.п.), get_or_build - обращения к кэшу справочников и
+связей пользователя. Значения копятся в памяти процесса.
+
+У gunicorn каждый воркер - отдельный процесс, поэтому при заданном
+METRICS_DIR воркер не чаще раза в METRICS_FLUSH_INTERVAL секунд
+сохраняет свои значения в METRICS_DIR/<pid>.json, а /metrics суммирует
+файлы всех воркеров, в том числе завершившихся: счётчики не убывают.
+Каталог нужно очищать при старте сервера. Без METRICS_DIR в ответе
+только процесс, обработавший запрос.
+"""
+import atexit
+import json
+import os
+import resource
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .executor import RequestMiddleware
+
+PREFIX = 'foodgram'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                    10.0)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+COUNTERS = {
+    'http_requests_total': 'Запросы по действию, методу и статусу.',
+    'db_queries_total': 'SQL-запросы по действию.',
+    'cache_lookups_total': 'Обращения к кэшу get_or_build: local, shared '
+                           'или miss.',
+}
+HISTOGRAMS = {
+    'http_request_duration_seconds': (
+        DURATION_BUCKETS, 'Длительность запроса по действию.'),
+    'http_request_db_queries': (
+        QUERIES_BUCKETS, 'Число SQL-запросов на запрос по действию.'),
+}
+UNMATCHED_VIEW = 'unmatched'
+
+
+class Registry:
+    """Счётчики и гистограммы одного процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.requests = 0
+        self.flushed = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += value
+
+    def observe(self, name, value, **labels):
+        buckets, _ = HISTOGRAMS[name]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            counts = self.histograms.setdefault(
+                key, [0] * len(buckets) + [0.0, 0])
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def dump(self):
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'requests': self.requests,
+                'max_rss_bytes': resource.getrusage(
+                    resource.RUSAGE_SELF).ru_maxrss * 1024,
+                'counters': [[name, labels, value] for (name, labels), value
+                             in self.counters.items()],
+                'histograms': [[name, labels, list(counts)]
+                               for (name, labels), counts
+                               in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        now = time.monotonic()
+        if not directory or (
+                not force
+                and now - self.flushed < settings.METRICS_FLUSH_INTERVAL):
+            return
+        self.flushed = now
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+            json.dump(self.dump(), file)
+        os.replace(f'{path}.tmp', path)
+
+
+registry = Registry()
+# Последние значения воркера не теряются при его остановке.
+atexit.register(registry.flush, force=True)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_dumps():
+    """Сохранённые значения всех процессов; текущий - из памяти."""
+    own = registry.dump()
+    dumps = [own]
+    directory = settings.METRICS_DIR
+    if not directory:
+        return dumps
+    for name in os.listdir(directory):
+        if not name.endswith('.json') or name == f'{own["pid"]}.json':
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as file:
+                dumps.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return dumps
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"').replace('\n', r'\n'))
+        for name, value in labels)
+    return f'{{{pairs}}}'
+
+
+def format_header(name, kind, description):
+    return [f'# HELP {PREFIX}_{name} {description}',
+            f'# TYPE {PREFIX}_{name} {kind}']
+
+
+def render_counters(dumps):
+    totals = defaultdict(float)
+    for dump in dumps:
+        for name, labels, value in dump['counters']:
+            totals[(name, tuple(map(tuple, labels)))] += value
+    lines = []
+    for name, description in COUNTERS.items():
+        lines += format_header(name, 'counter', description)
+        lines += [f'{PREFIX}_{name}{format_labels(labels)} {value:g}'
+                  for (metric, labels), value in sorted(totals.items())
+                  if metric == name]
+    return lines
+
+
+def render_histograms(dumps):
+    totals = {}
+    for dump in dumps:
+        for name, labels, counts in dump['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            if key in totals:
+                totals[key] = [a + b for a, b in zip(totals[key], counts)]
+            else:
+                totals[key] = counts
+    lines = []
+    for name, (buckets, description) in HISTOGRAMS.items():
+        lines += format_header(name, 'histogram', description)
+        for (metric, labels), counts in sorted(totals.items()):
+            if metric != name:
+                continue
+            # В дампе число попаданий в каждую границу уже накопительное.
+            for bound, count in zip(buckets, counts):
+                bucket_labels = labels + (('le', f'{bound:g}'),)
+                lines.append(f'{PREFIX}_{name}_bucket'
+                             f'{format_labels(bucket_labels)} {count}')
+            lines.append(f'{PREFIX}_{name}_bucket'
+                         f'{format_labels(labels + (("le", "+Inf"),))} '
+                         f'{counts[-1]}')
+            lines.append(f'{PREFIX}_{name}_sum{format_labels(labels)} '
+                         f'{counts[-2]:g}')
+            lines.append(f'{PREFIX}_{name}_count{format_labels(labels)} '
+                         f'{counts[-1]}')
+    return lines
+
+
+def render_workers(dumps):
+    alive = [dump for dump in dumps if is_alive(dump['pid'])]
+    lines = format_header('workers', 'gauge', 'Живые процессы с метриками.')
+    lines.append(f'{PREFIX}_workers {len(alive)}')
+    lines += format_header('worker_requests_total', 'counter',
+                           'Запросы, обработанные процессом.')
+    lines += [f'{PREFIX}_worker_requests_total'
+              f'{format_labels([("pid", dump["pid"])])} {dump["requests"]}'
+              for dump in alive]
+    lines += format_header('worker_max_rss_bytes', 'gauge',
+                           'Пиковая резидентная память процесса.')
+    lines += [f'{PREFIX}_worker_max_rss_bytes'
+              f'{format_labels([("pid", dump["pid"])])} '
+              f'{dump["max_rss_bytes"]}'
+              for dump in alive]
+    return lines
+
+
+def render_response_cache():
+    # Статистика кэша ответов уже общая для процессов: она в общем кэше.
+    # Импорт здесь: response_cache зависит от cache, а cache - от metrics.
+    from .response_cache import HIT, MISS, get_stats
+
+    lines = format_header('response_cache_requests_total', 'counter',
+                          'Запросы к кэшу ответов для анонимов.')
+    stats = get_stats()
+    for action, values in stats.items():
+        for outcome in (HIT, MISS):
+            labels = [('action', action), ('outcome', outcome)]
+            lines.append(f'{PREFIX}_response_cache_requests_total'
+                         f'{format_labels(labels)} {values[outcome]}')
+    lines += format_header('response_cache_hit_ratio', 'gauge',
+                           'Доля попаданий в кэш ответов для анонимов.')
+    lines += [f'{PREFIX}_response_cache_hit_ratio'
+              f'{format_labels([("action", action)])} '
+              f'{values["hit_ratio"]}'
+              for action, values in stats.items()
+              if values['hit_ratio'] is not None]
+    return lines
+
+
+def render():
+    dumps = read_dumps()
+    lines = (render_counters(dumps) + render_histograms(dumps)
+             + render_workers(dumps) + render_response_cache())
+    return '\n'.join(lines) + '\n'
+
+
+def get_cache_namespace(namespace):
+    # relations:<id> и т.п. - одна метка на вид кэша, а не на пользователя.
+    return namespace.split(':', 1)[0]
+
+
+def count_cache_lookup(namespace, outcome):
+    if settings.METRICS_ENABLED:
+        registry.inc('cache_lookups_total',
+                     namespace=get_cache_namespace(namespace),
+                     outcome=outcome)
+
+
+def get_view_name(request):
+    """RecipeViewSet.list для viewset, имя функции для остального."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED_VIEW
+    view_func, method = match.func, request.method
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', UNMATCHED_VIEW)
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware(RequestMiddleware):
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        if settings.METRICS_DIR:
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        super().__init__(get_response)
+
+    def start(self, request):
+        return time.perf_counter(), QueryCounter()
+
+    def get_query_wrapper(self, state):
+        return state[1]
+
+    def finish(self, request, response, state):
+        start, queries = state
+        duration = time.perf_counter() - start
+        view = get_view_name(request)
+        registry.inc('http_requests_total', view=view,
+                     method=request.method, status=response.status_code)
+        registry.inc('db_queries_total', queries.count, view=view)
+        registry.observe('http_request_duration_seconds', duration,
+                         view=view)
+        registry.observe('http_request_db_queries', queries.count, view=view)
+        with registry.lock:
+            registry.requests += 1
+        registry.flush()
+        return response
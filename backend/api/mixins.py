@@ -0,0 +1,77 @@
+from urllib.parse import urlencode
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import get_or_build, get_version, make_key
+from . import response_cache
+
+
+class CachedListMixin:
+    """Список из версионируемого кэша с поддержкой ETag."""
+    cache_namespace = None
+
+    def get_cache_key(self, request):
+        return urlencode(sorted(request.query_params.lists()), doseq=True)
+
+    def build_list(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        return list(self.get_serializer(queryset, many=True).data)
+
+    def list(self, request, *args, **kwargs):
+        version = get_version(self.cache_namespace)
+        key = self.get_cache_key(request)
+        etag = quote_etag(make_key(self.cache_namespace, version, key))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        data = get_or_build(
+            self.cache_namespace, key, self.build_list, version=version)
+        response = Response(data)
+        response['ETag'] = etag
+        return response
+
+
+class AnonymousResponseCacheMixin:
+    """Готовые ответы list/retrieve рецептов для анонимных пользователей."""
+
+    def get_cached_response(self, request, namespace, key, build):
+        full_key = response_cache.get_response_key(request, namespace, key)
+        data = response_cache.get_cached(full_key)
+        if data is not None:
+            response_cache.count(self.action, response_cache.HIT)
+            return Response(data)
+        response_cache.count(self.action, response_cache.MISS)
+        response = build()
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.set_cached(full_key, response.data)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        return self.get_cached_response(
+            request,
+            response_cache.get_list_namespace(request.query_params),
+            'list:' + response_cache.normalize_params(request.query_params),
+            lambda: super(AnonymousResponseCacheMixin, self).list(
+                request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        author_id = None
+        if request.user.is_anonymous and pk.isdigit():
+            author_id = response_cache.get_recipe_author(pk)
+        if author_id is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.get_cached_response(
+            request,
+            response_cache.get_author_namespace(author_id),
+            f'retrieve:{pk}',
+            lambda: super(AnonymousResponseCacheMixin, self).retrieve(
+                request, *args, **kwargs),
+        )
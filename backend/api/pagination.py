@@ -1,7 +1,236 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+from datetime import date
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, Cursor,
+                                       CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.utils.urls import replace_query_param
+
+from recipe.feed import FEED_PUB_DATE
+from .filters import get_recipe_ordering
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса, только для PostgreSQL."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Для больших выборок COUNT(*) заменяется оценкой планировщика.
+
+    Включается настройкой PAGINATION_ESTIMATED_COUNT_THRESHOLD: если оценка
+    меньше порога, считается точное значение.
+    """
+
+    @cached_property
+    def count(self):
+        threshold = settings.PAGINATION_ESTIMATED_COUNT_THRESHOLD
+        if threshold and hasattr(self.object_list, 'query'):
+            estimate = estimate_count(self.object_list)
+            if estimate is not None and estimate >= threshold:
+                return estimate
+        return super().count
 
 
 class RecipePagination(PageNumberPagination):
+    django_paginator_class = EstimatedCountPaginator
+    page_size_query_param = 'limit'
+    page_size = 6
+    max_page_size = 6
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}'
+                 for field in ordering)
+
+
+def get_keyset_filter(ordering, values):
+    """Строки после values в порядке ordering.
+
+    Для ('-a', '-id'): a < v OR (a = v AND id < pk).
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{field.lstrip("-")}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Курсор из значений всех полей порядка, последнее - уникальное.
+
+    CursorPagination из DRF хранит только значение первого поля и
+    пропускает одинаковые значения смещением не больше offset_cutoff: при
+    ordering=popular, где у большинства рецептов 0 в избранном, ссылки next
+    повторяли одни и те же рецепты без конца. Здесь курсор указывает на
+    конкретную строку, а страница выбирается условием get_keyset_filter.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = None if self.cursor is None else self.cursor.position
+        ordering = reverse_ordering(self.ordering) if reverse else (
+            self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            try:
+                queryset = queryset.filter(
+                    get_keyset_filter(ordering, position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False, position=self.get_edge(-1)))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True, position=self.get_edge(0)))
+
+    def get_edge(self, index):
+        """Значения полей крайней строки страницы или текущего курсора."""
+        if not self.page:
+            return self.cursor.position
+        instance = self.page[index]
+        return [getattr(instance, field.lstrip('-'))
+                for field in self.ordering]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(b64decode(encoded.encode('ascii')))
+            reverse, position = bool(data['r']), data['p']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(
+                self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        # Даты - полным isoformat: DjangoJSONEncoder отбросил бы
+        # микросекунды, и строка на границе страницы потерялась бы.
+        position = [value.isoformat() if isinstance(value, date) else value
+                    for value in cursor.position]
+        data = json.dumps({'r': int(cursor.reverse), 'p': position})
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            b64encode(data.encode()).decode('ascii'))
+
+
+class RecipeCursorPagination(KeysetCursorPagination):
     page_size_query_param = 'limit'
     page_size = 6
     max_page_size = 6
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        """Курсор следует порядку из параметра ordering."""
+        return get_recipe_ordering(request)
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    """Лента подписок: всегда от новых к старым."""
+
+    def get_ordering(self, request, queryset, view):
+        if FEED_PUB_DATE in queryset.query.annotations:
+            return (f'-{FEED_PUB_DATE}', '-id')
+        return self.ordering
+
+
+class SubscriptionCursorPagination(RecipeCursorPagination):
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+
+class CursorOptInPagination(BasePagination):
+    """Постраничная пагинация по умолчанию, курсорная - по запросу.
+
+    Курсорный режим включается параметром ?pagination=cursor; ссылки
+    next/previous в этом режиме содержат cursor и сохраняют режим.
+    """
+    mode_query_param = 'pagination'
+    page_class = None
+    cursor_class = None
+
+    def __init__(self):
+        self.paginator = self.page_class()
+
+    def is_cursor_mode(self, request):
+        return (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.cursor_class.cursor_query_param
+                in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_cursor_mode(request):
+            self.paginator = self.cursor_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+
+class RecipeListPagination(CursorOptInPagination):
+    page_class = RecipePagination
+    cursor_class = RecipeCursorPagination
+
+
+class SubscriptionPagination(CursorOptInPagination):
+    page_class = RecipePagination
+    cursor_class = SubscriptionCursorPagination
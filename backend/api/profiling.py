@@ -0,0 +1,149 @@
+"""Профилирование запросов: SQL, сериализаторы, разбор картинок.
+
+ProfilingMiddleware включается настройкой PROFILING_SAMPLE_RATE - долей
+профилируемых запросов от 0 до 1. При 0 Django исключает middleware из
+цепочки, а section() и ProfiledSerializerMixin сводятся к чтению
+contextvar.
+
+Для выбранного запроса считаются число и суммарное время SQL, повторы
+одинаковых запросов (признак N+1), время сериализаторов и разбора
+картинок без учёта SQL внутри них и размер ответа. Результат уходит в
+заголовок Server-Timing и строкой JSON в логгер api.profiling.
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .executor import RequestMiddleware
+
+logger = logging.getLogger(__name__)
+
+current_profile = ContextVar('current_profile', default=None)
+
+# IN (%s, %s, ...) разной длины - один и тот же запрос.
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+DUPLICATES_IN_LOG = 5
+
+
+def get_fingerprint(sql):
+    return IN_LIST.sub('IN (...)', sql)
+
+
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.sections = Counter()
+        self.depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.fingerprints[get_fingerprint(sql)] += 1
+
+    @property
+    def queries(self):
+        return sum(self.fingerprints.values())
+
+    def get_duplicates(self):
+        return [(sql, count) for sql, count in self.fingerprints.most_common()
+                if count > 1]
+
+    def get_timings(self, total):
+        """Отрезки для Server-Timing, мс."""
+        timings = {'sql': self.sql_time * 1000}
+        timings.update((name, duration * 1000)
+                       for name, duration in self.sections.items())
+        timings['total'] = total * 1000
+        return timings
+
+
+@contextmanager
+def section(name):
+    """Добавляет время блока без учёта SQL к отрезку name профиля.
+
+    Вложенные блоки не считаются повторно.
+    """
+    profile = current_profile.get()
+    if profile is None or profile.depth:
+        yield
+        return
+    profile.depth += 1
+    start, sql_start = time.perf_counter(), profile.sql_time
+    try:
+        yield
+    finally:
+        profile.depth -= 1
+        profile.sections[name] += (time.perf_counter() - start
+                                   - (profile.sql_time - sql_start))
+
+
+class ProfiledSerializerMixin:
+    """Учитывает время to_representation в отрезке serializer."""
+
+    def to_representation(self, instance):
+        with section('serializer'):
+            return super().to_representation(instance)
+
+
+def get_response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+class ProfilingMiddleware(RequestMiddleware):
+    def __init__(self, get_response):
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def start(self, request):
+        if random.random() >= self.sample_rate:
+            return None
+        profile = Profile()
+        return profile, current_profile.set(profile)
+
+    def get_query_wrapper(self, state):
+        return state[0].record_query
+
+    def end(self, state):
+        current_profile.reset(state[1])
+
+    def finish(self, request, response, state):
+        profile = state[0]
+        total = time.perf_counter() - profile.started
+        timings = profile.get_timings(total)
+        duplicates = profile.get_duplicates()
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration:.2f}'
+            + (f';desc="{profile.queries} queries, '
+               f'{len(duplicates)} repeated"' if name == 'sql' else '')
+            for name, duration in timings.items())
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': profile.queries,
+            'timings_ms': {name: round(duration, 2)
+                           for name, duration in timings.items()},
+            'response_bytes': get_response_size(response),
+            'duplicates': [
+                {'sql': sql[:200], 'count': count}
+                for sql, count in duplicates[:DUPLICATES_IN_LOG]
+            ],
+        }, ensure_ascii=False))
+        return response
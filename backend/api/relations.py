@@ -0,0 +1,67 @@
+"""Связи текущего пользователя: избранное, корзина и подписки.
+
+Все id загружаются один раз на запрос, а при включённом
+USER_RELATIONS_CACHE_TIMEOUT - один раз до следующего изменения.
+Сериализаторы и фильтры проверяют принадлежность по множествам
+вместо отдельного запроса на каждый объект.
+"""
+from django.conf import settings
+
+from recipe.models import FollowRecipes, ShoppingCart
+from users.models import FollowAuthor
+from .cache import RELATIONS_CACHE, bump_version, get_or_build
+
+# Больше id фильтр передаёт в базу подзапросом, а не списком.
+INLINE_IDS_LIMIT = 500
+
+EMPTY = frozenset()
+
+
+def get_relations_namespace(user_id):
+    return f'{RELATIONS_CACHE}:{user_id}'
+
+
+def invalidate_relations(user_id):
+    bump_version(get_relations_namespace(user_id))
+
+
+class UserRelationSet:
+    def __init__(self, favorites=EMPTY, cart=EMPTY, following=EMPTY):
+        self.favorites = favorites
+        self.cart = cart
+        self.following = following
+
+    @classmethod
+    def load(cls, user):
+        return cls(
+            favorites=frozenset(FollowRecipes.objects.filter(
+                user=user).values_list('recipes_id', flat=True)),
+            cart=frozenset(ShoppingCart.objects.filter(
+                user=user).values_list('recipe_id', flat=True)),
+            following=frozenset(FollowAuthor.objects.filter(
+                user=user).values_list('author_id', flat=True)),
+        )
+
+    @classmethod
+    def for_user(cls, user):
+        if user.is_anonymous:
+            return cls()
+        timeout = settings.USER_RELATIONS_CACHE_TIMEOUT
+        if not timeout:
+            return cls.load(user)
+        favorites, cart, following = get_or_build(
+            get_relations_namespace(user.id), 'sets',
+            lambda: cls.load(user).as_tuple(), timeout=timeout)
+        return cls(favorites, cart, following)
+
+    @classmethod
+    def for_request(cls, request):
+        """Один набор на запрос: сериализаторы и фильтры делят его."""
+        relations = getattr(request, '_user_relations', None)
+        if relations is None:
+            relations = cls.for_user(request.user)
+            request._user_relations = relations
+        return relations
+
+    def as_tuple(self):
+        return self.favorites, self.cart, self.following
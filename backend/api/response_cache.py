@@ -0,0 +1,134 @@
+"""Кэш готовых ответов списка и страницы рецепта для анонимов.
+
+Ключ строится из нормализованных параметров запроса и версий (поколений)
+данных, от которых зависит ответ:
+
+* список без фильтра по автору - общее поколение рецептов;
+* список рецептов одного автора и страница рецепта - поколение автора;
+* всегда - версии справочников тегов и ингредиентов;
+* список с ordering=trending - версия оценок популярности, её
+  увеличивает команда update_trending.
+
+Изменение рецепта или автора увеличивает поколение автора и общее,
+поэтому страницы других авторов остаются в кэше.
+
+Счётчики избранного, корзины и подписчиков меняются при каждом
+переключении и увеличивают только поколения авторов: в общих списках
+они обновляются по истечении RECIPES_RESPONSE_CACHE_TIMEOUT.
+"""
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+from recipe.models import Recipe
+from .cache import (INGREDIENTS_CACHE, LOCAL_CACHE, RECIPES_CACHE,
+                    SHARED_CACHE, TAGS_CACHE, TRENDING_CACHE, bump_version,
+                    get_versions, make_key)
+from .filters import ORDERING_TRENDING
+
+# Параметры, влияющие на ответ анонимному пользователю.
+LIST_PARAMS = ('author', 'cursor', 'limit', 'ordering', 'page', 'pagination',
+               'search', 'tags', 'tags_mode')
+
+HIT = 'hit'
+MISS = 'miss'
+ACTIONS = ('list', 'retrieve')
+
+
+def get_author_namespace(author_id):
+    return f'{RECIPES_CACHE}:author:{author_id}'
+
+
+def invalidate_authors(*author_ids):
+    for author_id in author_ids:
+        bump_version(get_author_namespace(author_id))
+
+
+def invalidate_recipes(*author_ids):
+    invalidate_authors(*author_ids)
+    bump_version(RECIPES_CACHE)
+
+
+def normalize_params(query_params):
+    """Параметры списка в каноническом виде: порядок и повторы не важны."""
+    params = []
+    for name in LIST_PARAMS:
+        values = sorted(set(query_params.getlist(name)))
+        if name == 'page' and values == ['1']:
+            continue
+        params.extend((name, value) for value in values)
+    return urlencode(params)
+
+
+def get_recipe_author(pk):
+    """id автора рецепта; связь не меняется, поэтому хранится без версии."""
+    shared = caches[SHARED_CACHE]
+    key = f'{RECIPES_CACHE}:author_of:{pk}'
+    author_id = shared.get(key)
+    if author_id is None:
+        author_id = Recipe.objects.filter(pk=pk).values_list(
+            'author_id', flat=True).first()
+        if author_id is not None:
+            shared.set(key, author_id, timeout=None)
+    return author_id
+
+
+def get_list_namespace(query_params):
+    authors = query_params.getlist('author')
+    if len(authors) == 1 and authors[0].isdigit():
+        return get_author_namespace(authors[0])
+    return RECIPES_CACHE
+
+
+def get_response_key(request, namespace, key):
+    namespaces = [namespace, TAGS_CACHE, INGREDIENTS_CACHE]
+    if request.query_params.get('ordering') == ORDERING_TRENDING:
+        namespaces.append(TRENDING_CACHE)
+    versions = get_versions(*namespaces)
+    version = '.'.join(str(version) for version in versions)
+    # Ссылки на картинки абсолютные и зависят от хоста.
+    return make_key(RECIPES_CACHE, version, f'{request.get_host()}:{key}')
+
+
+def get_cached(full_key):
+    value = caches[LOCAL_CACHE].get(full_key)
+    if value is None:
+        value = caches[SHARED_CACHE].get(full_key)
+        if value is not None:
+            caches[LOCAL_CACHE].set(
+                full_key, value, settings.RECIPES_RESPONSE_CACHE_TIMEOUT)
+    return value
+
+
+def set_cached(full_key, value):
+    timeout = settings.RECIPES_RESPONSE_CACHE_TIMEOUT
+    caches[SHARED_CACHE].set(full_key, value, timeout)
+    caches[LOCAL_CACHE].set(full_key, value, timeout)
+
+
+def get_stats_key(action, outcome):
+    return f'stats:{RECIPES_CACHE}:{action}:{outcome}'
+
+
+def count(action, outcome):
+    shared = caches[SHARED_CACHE]
+    key = get_stats_key(action, outcome)
+    if not shared.add(key, 1, timeout=None):
+        try:
+            shared.incr(key)
+        except ValueError:
+            pass
+
+
+def get_stats():
+    keys = {get_stats_key(action, outcome): (action, outcome)
+            for action in ACTIONS for outcome in (HIT, MISS)}
+    found = caches[SHARED_CACHE].get_many(keys)
+    stats = {action: {HIT: 0, MISS: 0} for action in ACTIONS}
+    for key, (action, outcome) in keys.items():
+        stats[action][outcome] = found.get(key, 0)
+    for values in stats.values():
+        total = values[HIT] + values[MISS]
+        values['hit_ratio'] = round(values[HIT] / total, 4) if total else None
+    return stats
@@ -1,16 +1,37 @@
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.core.validators import MinValueValidator
 from rest_framework import status
+from rest_framework.exceptions import APIException
 from rest_framework.serializers import ValidationError
-from rest_framework.fields import IntegerField, SerializerMethodField
+from rest_framework.fields import (IntegerField, ListField, ReadOnlyField,
+                                   SerializerMethodField)
 from rest_framework.relations import PrimaryKeyRelatedField
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import ModelSerializer, Serializer
 
 from djoser.serializers import UserSerializer, UserCreateSerializer
-from drf_extra_fields.fields import Base64ImageField
 
+from recipe.images import schedule_image_processing
 from recipe.models import Recipe, Tag, IngredientsBd, IngredientsRecipe
+from recipe.search import update_search_vectors
 from users.models import User
+from .fields import QueuedBase64ImageField, RecipeImageField
+from .profiling import ProfiledSerializerMixin
+from .relations import UserRelationSet
+
+
+class IngredientsError(APIException):
+    """Ошибка состава рецепта, в которой id ингредиентов остаются числами.
+
+    ValidationError приводит все значения к строкам, поэтому ошибка
+    передаётся обработчику исключений DRF в обход проверки сериализатора.
+    """
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = 'invalid'
+
+    def __init__(self, errors):
+        self.detail = {'ingredients': errors}
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -38,7 +59,7 @@ class UserAfterRegistration(UserSerializer):
         )
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(ProfiledSerializerMixin, UserSerializer):
     is_subscribed = SerializerMethodField(read_only=True)
 
     class Meta:
@@ -50,69 +71,67 @@ class CustomUserSerializer(UserSerializer):
             'first_name',
             'last_name',
             'is_subscribed',
+            'recipes_count',
+            'followers_count',
         )
 
     def get_is_subscribed(self, author):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.follower.filter(author=author).exists()
+        relations = UserRelationSet.for_request(self.context.get('request'))
+        return author.id in relations.following
 
 
-class TagSerializer(ModelSerializer):
+class TagSerializer(ProfiledSerializerMixin, ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'slug',)
 
 
-class IngredientsBdSerializer(ModelSerializer):
+class IngredientsBdSerializer(ProfiledSerializerMixin, ModelSerializer):
     class Meta:
         model = IngredientsBd
         fields = ('id', 'name', 'measurement_unit', )
 
 
 class IngredientsRecipeSerializer(ModelSerializer):
-    id = IntegerField(required=True)
-    name = SerializerMethodField(read_only=True)
-    measurement_unit = SerializerMethodField(read_only=True)
-    amount = IntegerField(required=True, validators=[MinValueValidator(1)])
+    id = ReadOnlyField(source='ingredient.id')
+    name = ReadOnlyField(source='ingredient.name')
+    measurement_unit = ReadOnlyField(source='ingredient.measurement_unit')
 
     class Meta:
         model = IngredientsRecipe
         fields = ('id', 'name', 'measurement_unit', 'amount', )
 
-    def get_name(self, obj):
-        name = obj.ingredients.name
-        return name
 
-    def get_measurement_unit(self, obj):
-        measurement_unit = obj.ingredients.measurement_unit
-        return measurement_unit
+class IngredientsRecipeWriteSerializer(ModelSerializer):
+    id = IntegerField(required=True)
+    amount = IntegerField(required=True, validators=[MinValueValidator(1)])
 
+    class Meta:
+        model = IngredientsRecipe
+        fields = ('id', 'amount', )
 
-class RecipeReadSerializer(ModelSerializer):
+
+class RecipeReadSerializer(ProfiledSerializerMixin, ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
-    ingredients = IngredientsRecipeSerializer(many=True, read_only=True)
-    image = Base64ImageField()
+    ingredients = IngredientsRecipeSerializer(source='recipe_ingredients',
+                                              many=True, read_only=True)
+    image = RecipeImageField()
+    image_webp = RecipeImageField(image_format='webp')
     is_favorited = SerializerMethodField(read_only=True)
     is_in_shopping_cart = SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
-        exclude = ['pub_date']
+        exclude = ['pub_date', 'updated', 'trending_score', 'search_vector']
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.follow_recipes.filter(recipes=obj).exists()
+        relations = UserRelationSet.for_request(self.context.get('request'))
+        return obj.id in relations.favorites
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.shopping_cart.filter(recipe=obj).exists()
+        relations = UserRelationSet.for_request(self.context.get('request'))
+        return obj.id in relations.cart
 
 
 class RecipeWriteSerializer(ModelSerializer):
@@ -120,8 +139,8 @@ class RecipeWriteSerializer(ModelSerializer):
         queryset=Tag.objects.all(), many=True,
         required=True)
     author = CustomUserSerializer(read_only=True)
-    ingredients = IngredientsRecipeSerializer(many=True, required=True)
-    image = Base64ImageField(required=True)
+    ingredients = IngredientsRecipeWriteSerializer(many=True, required=True)
+    image = QueuedBase64ImageField(required=True)
 
     class Meta:
         model = Recipe
@@ -137,29 +156,39 @@ class RecipeWriteSerializer(ModelSerializer):
         )
 
     def validate_ingredients(self, value):
-        ingredients = []
+        """Проверяет все ингредиенты одним запросом к базе.
+
+        Найденные объекты кладутся в validated_data, чтобы create/update
+        не запрашивали их повторно.
+        """
         if len(value) == 0:
             raise ValidationError(
                 detail='Отсутствуют значения в поле ingredients',
                 code=status.HTTP_400_BAD_REQUEST
             )
+        ids = set()
+        duplicates = set()
         for item in value:
-            if not IngredientsBd.objects.filter(id=item['id']).exists():
-                raise ValidationError(
-                    detail='Такого ингредиента не существует',
-                    code=status.HTTP_400_BAD_REQUEST
-                )
-            ing = get_object_or_404(IngredientsBd, id=item['id'])
-            if ing in ingredients:
-                raise ValidationError({
-                    'ingredients': 'Повтор ингридиента.'
-                })
-            if int(item['amount']) <= 0:
-                raise ValidationError(
-                    detail='Количество ингредиента не может быть 0 или меньше',
-                    code=status.HTTP_400_BAD_REQUEST
-                )
-            ingredients.append(ing)
+            if item['id'] in ids:
+                duplicates.add(item['id'])
+            ids.add(item['id'])
+        ingredients = IngredientsBd.objects.in_bulk(ids)
+        missing = ids - ingredients.keys()
+        errors = {}
+        if duplicates:
+            errors['duplicates'] = {
+                'detail': 'Повтор ингридиента.',
+                'ids': sorted(duplicates),
+            }
+        if missing:
+            errors['not_found'] = {
+                'detail': 'Такого ингредиента не существует',
+                'ids': sorted(missing),
+            }
+        if errors:
+            raise IngredientsError(errors)
+        for item in value:
+            item['ingredient'] = ingredients[item['id']]
         return value
 
     def validate_tags(self, value):
@@ -182,13 +211,37 @@ class RecipeWriteSerializer(ModelSerializer):
         return value
 
     def create_ingredients_amount(self, ingredients, recipe):
-        for ingr in ingredients:
-            ing, _ = IngredientsRecipe.objects.get_or_create(
-                ingredients=IngredientsBd.objects.get(id=ingr['id']),
-                amount=ingr['amount'],
-            )
-            recipe.ingredients.add(ing.id)
+        IngredientsRecipe.objects.bulk_create([
+            IngredientsRecipe(recipe=recipe,
+                              ingredient=item['ingredient'],
+                              amount=item['amount'])
+            for item in ingredients
+        ])
+
+    def update_ingredients_amount(self, ingredients, recipe):
+        """Пишет только разницу между старым и новым составом."""
+        amounts = {item['id']: item['amount'] for item in ingredients}
+        current = {row.ingredient_id: row
+                   for row in recipe.recipe_ingredients.all()}
+        removed = [row.id for ingredient_id, row in current.items()
+                   if ingredient_id not in amounts]
+        if removed:
+            IngredientsRecipe.objects.filter(id__in=removed).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            IngredientsRecipe.objects.bulk_update(changed, ('amount',))
+        self.create_ingredients_amount(
+            recipe=recipe,
+            ingredients=[item for item in ingredients
+                         if item['id'] not in current],
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -197,8 +250,14 @@ class RecipeWriteSerializer(ModelSerializer):
         self.create_ingredients_amount(recipe=recipe,
                                        ingredients=ingredients,
                                        )
+        update_search_vectors([recipe.id])
+        schedule_image_processing(recipe)
+        # Сигнал увеличил recipes_count через F(): в ответе нужен новый.
+        recipe.author.refresh_from_db(
+            fields=('followers_count', 'recipes_count'))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'tags' not in validated_data:
             raise ValidationError(
@@ -212,22 +271,36 @@ class RecipeWriteSerializer(ModelSerializer):
             )
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        instance.tags.clear()
         instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients_amount(recipe=instance,
+        self.update_ingredients_amount(recipe=instance,
                                        ingredients=ingredients,
                                        )
-        return super().update(instance, validated_data)
+        recipe = super().update(instance, validated_data)
+        update_search_vectors([recipe.id])
+        if 'image' in validated_data:
+            schedule_image_processing(recipe)
+        return recipe
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        prefetch_related_objects(
+            [instance], 'tags', 'recipe_ingredients__ingredient',
+            'renditions')
         return RecipeReadSerializer(instance, context=context).data
 
 
-class RecipeForFollowSerializer(ModelSerializer):
-    image = Base64ImageField()
+def get_recipes_limit(request):
+    """Положительное значение recipes_limit из запроса или None."""
+    try:
+        limit = int(request.query_params.get('recipes_limit', ''))
+    except ValueError:
+        return None
+    return limit if limit > 0 else None
+
+
+class RecipeForFollowSerializer(ProfiledSerializerMixin, ModelSerializer):
+    image = RecipeImageField(size=settings.RECIPE_IMAGE_SHORT_SIZE)
 
     class Meta:
         model = Recipe
@@ -239,24 +312,29 @@ class RecipeForFollowSerializer(ModelSerializer):
         )
 
 
+class BulkIdsSerializer(Serializer):
+    """Список id для пакетного добавления или удаления."""
+    ids = ListField(child=IntegerField(min_value=1), allow_empty=False,
+                    max_length=settings.BULK_RELATIONS_MAX_IDS)
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
+
+
+ALREADY_SUBSCRIBED = 'Вы уже подписаны на этого пользователя.'
+
+
 class FollowAuthorSerializer(CustomUserSerializer):
-    recipes_count = SerializerMethodField()
     recipes = SerializerMethodField()
 
     class Meta(CustomUserSerializer.Meta):
-        fields = CustomUserSerializer.Meta.fields + (
-            'recipes_count', 'recipes'
-        )
+        fields = CustomUserSerializer.Meta.fields + ('recipes',)
         read_only_fields = ('email', 'username')
 
     def validate(self, data):
+        # Повторную подписку отсекает вставка в CustomUserViewSet.subscribe.
         author = self.instance
         user = self.context.get('request').user
-        if user.follower.filter(author=author).exists():
-            raise ValidationError(
-                detail='Вы уже подписаны на этого пользователя.',
-                code=status.HTTP_400_BAD_REQUEST
-            )
         if user == author:
             raise ValidationError(
                 detail='на самого себя подписаться не получится)',
@@ -264,15 +342,11 @@ class FollowAuthorSerializer(CustomUserSerializer):
             )
         return data
 
-    def get_recipes_count(self, author):
-        return author.recipes.count()
-
     def get_recipes(self, author):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
+        limit = get_recipes_limit(self.context.get('request'))
         recipes = author.recipes.all()
         if limit:
-            recipes = recipes[:int(limit)]
+            recipes = recipes[:limit]
         serializer = RecipeForFollowSerializer(
             recipes, many=True, read_only=True)
         return serializer.data
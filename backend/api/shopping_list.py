@@ -0,0 +1,135 @@
+"""Выгрузка списка покупок в разных форматах."""
+import csv
+import hashlib
+import io
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Count, Max, Sum
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from recipe.models import IngredientsRecipe
+
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FALLBACK_FONT = 'Helvetica'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+STREAM_CHUNK_SIZE = 8192
+
+
+def get_cart_state(user):
+    """Сводка корзины для ETag одним запросом."""
+    return user.shopping_cart.aggregate(
+        count=Count('id'),
+        last_id=Max('id'),
+        recipes_updated=Max('recipe__updated'),
+    )
+
+
+def get_cart_etag(user, state, file_format):
+    """ETag меняется при любом изменении корзины, рецептов в ней
+    или шапки файла (имя пользователя и дата).
+
+    Last-Modified не отдаём: удаление из корзины не сдвигает ни одну
+    из дат, и по If-Modified-Since клиент получил бы устаревший список.
+    """
+    key = ':'.join((
+        file_format, str(state['count']), str(state['last_id']),
+        state['recipes_updated'].isoformat(), *get_header(user)))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def get_cart_ingredients(user):
+    """Ингредиенты корзины, просуммированные на стороне БД."""
+    return IngredientsRecipe.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit'
+    ).annotate(
+        amount=Sum('amount')
+    ).order_by('ingredient__name').iterator()
+
+
+def get_header(user):
+    return (f'Список покупок для: {user.get_full_name()}',
+            f'Дата: {datetime.today():%Y-%m-%d}')
+
+
+def format_ingredient(ingredient):
+    return (f'- {ingredient["ingredient__name"]} '
+            f'({ingredient["ingredient__measurement_unit"]})'
+            f' - {ingredient["amount"]}')
+
+
+def render_txt(user, ingredients):
+    title, date = get_header(user)
+    yield f'{title}\n\n{date}\n\n'
+    for ingredient in ingredients:
+        yield f'{format_ingredient(ingredient)}\n'
+
+
+class Echo:
+    """Псевдо-буфер: csv.writer пишет строку, а мы сразу её отдаём."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(user, ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['amount'],
+        ))
+
+
+def get_pdf_font():
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    try:
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT))
+    except Exception:
+        return PDF_FALLBACK_FONT
+    return PDF_FONT_NAME
+
+
+def render_pdf(user, ingredients):
+    """PDF собирается целиком и отдаётся кусками."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    font = get_pdf_font()
+    _, height = A4
+    y = height - PDF_MARGIN
+
+    def write_line(text):
+        nonlocal y
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            y = height - PDF_MARGIN
+        pdf.setFont(font, PDF_FONT_SIZE)
+        pdf.drawString(PDF_MARGIN, y, text)
+        y -= PDF_LINE_HEIGHT
+
+    for line in get_header(user):
+        write_line(line)
+    for ingredient in ingredients:
+        write_line(format_ingredient(ingredient))
+    pdf.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(STREAM_CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'pdf': ('application/pdf', render_pdf),
+}
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipe.feed import fan_out, follows_changed
+from recipe.models import (FollowRecipes, IngredientsBd, IngredientsRecipe,
+                           Recipe, RecipeImageJob, ShoppingCart, Tag)
+from recipe.search import update_search_vectors
+from users.models import FollowAuthor, User
+from .cache import INGREDIENTS_CACHE, TAGS_CACHE, bump_version
+from .counters import change_counter
+from .relations import invalidate_relations
+from .response_cache import invalidate_recipes
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags(**kwargs):
+    transaction.on_commit(lambda: bump_version(TAGS_CACHE))
+
+
+@receiver((post_save, post_delete), sender=IngredientsBd)
+def invalidate_ingredients(**kwargs):
+    transaction.on_commit(lambda: bump_version(INGREDIENTS_CACHE))
+
+
+@receiver(post_save, sender=IngredientsBd)
+def update_ingredient_recipes(instance, created, **kwargs):
+    # Переименование ингредиента меняет поисковый вектор рецептов с ним.
+    if not created:
+        update_search_vectors(list(IngredientsRecipe.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True)))
+
+
+@receiver((post_save, post_delete), sender=FollowRecipes)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=FollowAuthor)
+def invalidate_user_relations(instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_relations(user_id))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def invalidate_recipe(instance, **kwargs):
+    author_id = instance.author_id
+    transaction.on_commit(lambda: invalidate_recipes(author_id))
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(instance, created, **kwargs):
+    if created:
+        change_counter(User, 'recipes_count', [instance.author_id], 1)
+        fan_out(instance)
+
+
+@receiver(post_save, sender=FollowAuthor)
+def feed_follow(instance, created, **kwargs):
+    # Подписки через api.toggles сигналов не отправляют и обновляют
+    # ленту сами; здесь - правки из админки и каскадные удаления.
+    if created:
+        follows_changed(instance.user_id, [instance.author_id], 1)
+
+
+@receiver(post_delete, sender=FollowAuthor)
+def feed_unfollow(instance, **kwargs):
+    follows_changed(instance.user_id, [instance.author_id], -1)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(instance, **kwargs):
+    change_counter(User, 'recipes_count', [instance.author_id], -1)
+
+
+@receiver(post_save, sender=RecipeImageJob)
+def invalidate_recipe_image(instance, **kwargs):
+    # Готовые копии картинки меняют ссылки в ответах.
+    if instance.status != RecipeImageJob.DONE:
+        return
+    author_id = instance.recipe.author_id
+    transaction.on_commit(lambda: invalidate_recipes(author_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(instance, created, update_fields=None, **kwargs):
+    # У нового пользователя нет рецептов, а вход обновляет только
+    # last_login.
+    if created or update_fields and set(update_fields) <= {'last_login'}:
+        return
+    author_id = instance.id
+    transaction.on_commit(lambda: invalidate_recipes(author_id))
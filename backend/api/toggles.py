@@ -0,0 +1,181 @@
+"""Добавление и удаление связей пользователя одним запросом.
+
+Избранное, корзина и подписки - строки с уникальной парой
+(пользователь, объект). Вставка через ON CONFLICT DO NOTHING и удаление
+через DELETE ... RETURNING не требуют предварительной проверки exists()
+и не падают с IntegrityError при одновременных запросах.
+Сигналы моделей при этом не отправляются, поэтому кэш связей
+пользователя, кэш ответов анонимам, счётчики и лента подписок
+обновляются здесь же.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from recipe.feed import follows_changed
+from users.models import FollowAuthor
+from .counters import relation_counted
+from .relations import invalidate_relations
+from .response_cache import get_recipe_author, invalidate_authors
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+NOT_FOUND = 'not_found'
+
+
+def get_column(model, name):
+    return connection.ops.quote_name(model._meta.get_field(name).column)
+
+
+def get_params(model, values):
+    columns, params = [], []
+    for name, value in values.items():
+        field = model._meta.get_field(name)
+        columns.append(get_column(model, name))
+        params.append(field.get_db_prep_value(
+            getattr(value, 'pk', value), connection))
+    return columns, params
+
+
+def get_timestamps(model):
+    """Значения auto_now_add: в обход save() их заполняет запрос."""
+    now = timezone.now()
+    return {field.name: now for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now_add', False)}
+
+
+def get_ids(values):
+    return [getattr(value, 'pk', value) for value in values.values()]
+
+
+def execute_returning(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def get_changed_authors(model, ids):
+    """Авторы, в ответах о рецептах которых изменились счётчики."""
+    if model is FollowAuthor:
+        return set(ids)
+    return {get_recipe_author(pk) for pk in ids} - {None}
+
+
+def relations_changed(model, user, ids, delta):
+    relation_counted(model, ids, delta)
+    if model is FollowAuthor:
+        follows_changed(user.pk, list(ids), delta)
+    user_id = user.pk
+    authors = get_changed_authors(model, ids)
+
+    def invalidate():
+        invalidate_relations(user_id)
+        # Счётчики в общих списках устаревают до истечения кэша,
+        # а страницы авторов и рецептов обновляются сразу.
+        if authors:
+            invalidate_authors(*authors)
+
+    transaction.on_commit(invalidate)
+
+
+@transaction.atomic
+def add_relation(model, user, **values):
+    """True, если связь добавлена, и False, если она уже была."""
+    quote_name = connection.ops.quote_name
+    columns, params = get_params(
+        model, {'user': user, **values, **get_timestamps(model)})
+    sql = (
+        f'INSERT INTO {quote_name(model._meta.db_table)} '
+        f'({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(params))}) '
+        f'ON CONFLICT DO NOTHING '
+        f'RETURNING {quote_name(model._meta.pk.column)}'
+    )
+    added = bool(execute_returning(sql, params))
+    if added:
+        relations_changed(model, user, get_ids(values), 1)
+    return added
+
+
+@transaction.atomic
+def remove_relation(model, user, **values):
+    """True, если связь удалена, и False, если её не было."""
+    quote_name = connection.ops.quote_name
+    columns, params = get_params(model, {'user': user, **values})
+    condition = ' AND '.join(f'{column} = %s' for column in columns)
+    sql = (
+        f'DELETE FROM {quote_name(model._meta.db_table)} '
+        f'WHERE {condition} '
+        f'RETURNING {quote_name(model._meta.pk.column)}'
+    )
+    removed = bool(execute_returning(sql, params))
+    if removed:
+        relations_changed(model, user, get_ids(values), -1)
+    return removed
+
+
+@transaction.atomic
+def add_relations(model, user, field, ids):
+    """Связи со всеми существующими объектами из ids одним INSERT.
+
+    Возвращает id объектов, для которых связь действительно добавлена.
+    """
+    quote_name = connection.ops.quote_name
+    target = model._meta.get_field(field).related_model._meta
+    target_pk = quote_name(target.pk.column)
+    column = get_column(model, field)
+    extra_columns, extra_params = get_params(model, get_timestamps(model))
+    columns = ', '.join([get_column(model, 'user'), column, *extra_columns])
+    values = ', '.join(['%s', target_pk] + ['%s'] * len(extra_params))
+    placeholders = ', '.join(['%s'] * len(ids))
+    sql = (
+        f'INSERT INTO {quote_name(model._meta.db_table)} ({columns}) '
+        f'SELECT {values} FROM {quote_name(target.db_table)} '
+        f'WHERE {target_pk} IN ({placeholders}) '
+        f'ON CONFLICT DO NOTHING RETURNING {column}'
+    )
+    added = execute_returning(sql, [user.pk, *extra_params, *ids])
+    if added:
+        relations_changed(model, user, added, 1)
+    return added
+
+
+@transaction.atomic
+def remove_relations(model, user, field, ids):
+    """Удаляет связи одним DELETE и возвращает id затронутых объектов."""
+    quote_name = connection.ops.quote_name
+    column = get_column(model, field)
+    placeholders = ', '.join(['%s'] * len(ids))
+    sql = (
+        f'DELETE FROM {quote_name(model._meta.db_table)} '
+        f'WHERE {get_column(model, "user")} = %s '
+        f'AND {column} IN ({placeholders}) '
+        f'RETURNING {column}'
+    )
+    removed = execute_returning(sql, [user.pk, *ids])
+    if removed:
+        relations_changed(model, user, removed, -1)
+    return removed
+
+
+def bulk_toggle(method, model, user, field, ids, targets):
+    """Статус по каждому id для пакетного добавления или удаления.
+
+    targets - queryset объектов, с которыми разрешена связь; он
+    проверяет все id одним запросом.
+    """
+    if method == 'DELETE':
+        removed = remove_relations(model, user, field, ids)
+        return [{'id': pk, 'status': REMOVED if pk in removed else NOT_FOUND}
+                for pk in ids]
+    found = set(targets.filter(pk__in=ids).values_list('pk', flat=True))
+    added = add_relations(model, user, field, found) if found else set()
+    statuses = []
+    for pk in ids:
+        if pk in added:
+            status = ADDED
+        elif pk in found:
+            status = EXISTS
+        else:
+            status = NOT_FOUND
+        statuses.append({'id': pk, 'status': status})
+    return statuses
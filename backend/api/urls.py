@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .executor import async_patterns
 from .views import IngredientsBdViewSet, RecipeViewSet, TagViewSet
 
 app_name = 'api'
@@ -12,5 +13,5 @@ router.register('tags', TagViewSet)
 router.register('recipes', RecipeViewSet)
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(async_patterns(router.urls))),
 ]
@@ -1,48 +1,107 @@
-from datetime import datetime
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.db.models import Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import filters, status
+from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.status import HTTP_400_BAD_REQUEST
 from rest_framework.viewsets import ModelViewSet
 from rest_framework import permissions
 from rest_framework.decorators import action
 
+from recipe.feed import get_feed, use_materialized
 from recipe.models import (FollowRecipes, IngredientsBd,
                            IngredientsRecipe, Recipe,
                            ShoppingCart, Tag)
-from .pagination import RecipePagination
-from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from .autocomplete import get_index
+from .cache import INGREDIENTS_CACHE, TAGS_CACHE, make_key
+from .metrics import CONTENT_TYPE, render
+from .mixins import AnonymousResponseCacheMixin, CachedListMixin
+from .pagination import FeedCursorPagination, RecipeListPagination
+from .relations import UserRelationSet
+from .permissions import (IsAdminOrAuthenticated, IsAdminOrReadOnly,
+                          IsAuthorOrReadOnly)
+from .response_cache import get_stats
+from .toggles import add_relation, bulk_toggle, remove_relation
 from .filters import RecipeFilter, IngredientsBdFilter
-from .serializers import (IngredientsBdSerializer, RecipeReadSerializer,
+from .shopping_list import (SHOPPING_LIST_FORMATS, get_cart_etag,
+                            get_cart_ingredients, get_cart_state)
+from .serializers import (BulkIdsSerializer, IngredientsBdSerializer,
+                          RecipeReadSerializer,
                           RecipeForFollowSerializer, RecipeWriteSerializer,
                           TagSerializer)
 
 
-class TagViewSet(ModelViewSet):
+def metrics(request):
+    """Метрики в текстовом формате Prometheus."""
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+class TagViewSet(CachedListMixin, ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
+    cache_namespace = TAGS_CACHE
 
 
-class IngredientsBdViewSet(ModelViewSet):
+class IngredientsBdViewSet(CachedListMixin, ModelViewSet):
     queryset = IngredientsBd.objects.all()
     serializer_class = IngredientsBdSerializer
     permission_classes = (IsAdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
+    filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientsBdFilter
     pagination_class = None
+    cache_namespace = INGREDIENTS_CACHE
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Подсказки по названию без обращения к базе."""
+        query = request.query_params.get('name', '')
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.INGREDIENT_AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        limit = min(max(limit, 1), settings.INGREDIENT_AUTOCOMPLETE_MAX_LIMIT)
+        index, version = get_index()
+        etag = quote_etag(make_key(
+            INGREDIENTS_CACHE, version, f'autocomplete:{query}:{limit}'))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        response = Response(index.search(query, limit))
+        response['ETag'] = etag
+        return response
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(AnonymousResponseCacheMixin, ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = RecipePagination
+    pagination_class = RecipeListPagination
+    lookup_value_regex = r'\d+'
+
+    def get_queryset(self):
+        """Рецепты с заранее загруженными связями.
+
+        Флаги пользователя берутся из UserRelationSet, поэтому запрос
+        одинаков для анонимов и авторизованных.
+        """
+        return Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            'renditions',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=IngredientsRecipe.objects.select_related(
+                    'ingredient')
+            ),
+        )
 
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
@@ -52,35 +111,56 @@ class RecipeViewSet(ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, permission_classes=[IsAdminOrAuthenticated])
+    def cache_stats(self, request):
+        """Попадания и промахи кэша ответов для анонимов."""
+        return Response(get_stats())
+
     @action(
-        detail=True,
-        methods=['post', 'delete'],
-        permission_classes=[IsAuthenticated]
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=FeedCursorPagination,
     )
-    def favorite(self, request, pk):
-        """Метод для добавления/удаления из избранного."""
+    def feed(self, request):
+        """Рецепты авторов из подписок, от новых к старым."""
+        following = UserRelationSet.for_request(request).following
+        queryset = get_feed(self.get_queryset(), request.user,
+                            use_materialized(len(following)))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def toggle_recipe(self, request, pk, model, field, messages):
+        """Добавляет или удаляет рецепт одной записью в базу."""
         if request.method == 'POST':
-            if FollowRecipes.objects.filter(user=request.user,
-                                            recipes__id=pk).exists():
-                return Response({'Рецепт уже добален в избранное.'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            if not Recipe.objects.filter(id=pk).exists():
+            recipe = Recipe.objects.filter(id=pk).first()
+            if recipe is None:
                 return Response({'Такого рецепта не существует.'},
                                 status=status.HTTP_400_BAD_REQUEST)
-            recipe = Recipe.objects.get(id=pk)
-            FollowRecipes.objects.create(user=request.user, recipes=recipe)
+            if not add_relation(model, request.user, **{field: recipe}):
+                return Response({messages['exists']},
+                                status=status.HTTP_400_BAD_REQUEST)
             serializer = RecipeForFollowSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        else:
-            obj = FollowRecipes.objects.filter(
-                user=request.user, recipes__id=pk)
-            if obj.exists():
-                obj.delete()
-                return Response({'Рецепт успешно удален из избранного.'},
-                                status=status.HTTP_204_NO_CONTENT)
-            return Response({'Рецепта, который Вы хотите удалить'
-                            'из избранного, не существует.'},
-                            status=status.HTTP_404_NOT_FOUND)
+        if remove_relation(model, request.user, **{field: pk}):
+            return Response({messages['deleted']},
+                            status=status.HTTP_204_NO_CONTENT)
+        return Response({messages['not_found']},
+                        status=status.HTTP_404_NOT_FOUND)
+
+    @action(
+        detail=True,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite(self, request, pk):
+        """Метод для добавления/удаления из избранного."""
+        return self.toggle_recipe(request, pk, FollowRecipes, 'recipes', {
+            'exists': 'Рецепт уже добален в избранное.',
+            'deleted': 'Рецепт успешно удален из избранного.',
+            'not_found': ('Рецепта, который Вы хотите удалить'
+                          'из избранного, не существует.'),
+        })
 
     @action(
         detail=True,
@@ -89,28 +169,43 @@ class RecipeViewSet(ModelViewSet):
     )
     def shopping_cart(self, request, pk):
         """Метод для добавления/удаления из списка покупок."""
-        if request.method == 'POST':
-            if ShoppingCart.objects.filter(user=request.user,
-                                           recipe__id=pk).exists():
-                return Response({'Рецепт уже добален в список покупок.'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            if not Recipe.objects.filter(id=pk).exists():
-                return Response({'Такого рецепта не существует.'},
-                                status=status.HTTP_400_BAD_REQUEST)
-            recipe = Recipe.objects.get(id=pk)
-            ShoppingCart.objects.create(user=request.user, recipe=recipe)
-            serializer = RecipeForFollowSerializer(recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        else:
-            obj = ShoppingCart.objects.filter(user=request.user, recipe__id=pk)
-            if obj.exists():
-                obj.delete()
-                return Response({'Рецепт успешно удален из списка покупок.'},
-                                status=status.HTTP_204_NO_CONTENT)
-            return Response({'Рецепта, '
-                             'который Вы хотите удалить'
-                             'из списка покупок, не существует.'},
-                            status=status.HTTP_404_NOT_FOUND)
+        return self.toggle_recipe(request, pk, ShoppingCart, 'recipe', {
+            'exists': 'Рецепт уже добален в список покупок.',
+            'deleted': 'Рецепт успешно удален из списка покупок.',
+            'not_found': ('Рецепта, который Вы хотите удалить'
+                          'из списка покупок, не существует.'),
+        })
+
+    def bulk_toggle_recipes(self, request, model, field):
+        """Пакетное добавление или удаление со статусом по каждому id."""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'results': bulk_toggle(
+            request.method, model, request.user, field,
+            serializer.validated_data['ids'], Recipe.objects.all()
+        )})
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite',
+        url_name='favorite-bulk',
+    )
+    def favorite_bulk(self, request):
+        """Несколько рецептов в избранное или из него одним запросом."""
+        return self.bulk_toggle_recipes(request, FollowRecipes, 'recipes')
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart',
+        url_name='shopping-cart-bulk',
+    )
+    def shopping_cart_bulk(self, request):
+        """Несколько рецептов в список покупок или из него одним запросом."""
+        return self.bulk_toggle_recipes(request, ShoppingCart, 'recipe')
 
     @action(
         detail=False,
@@ -118,33 +213,34 @@ class RecipeViewSet(ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        """Метод для скачивания списка покупок."""
+        """Метод для скачивания списка покупок.
+
+        Формат выбирается параметром type: txt (по умолчанию), csv или pdf.
+        """
         user = request.user
-        if not user.shopping_cart.exists():
+        file_format = request.query_params.get('type', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                f'Неизвестный формат. Доступны: '
+                f'{", ".join(SHOPPING_LIST_FORMATS)}',
+                status=HTTP_400_BAD_REQUEST)
+        state = get_cart_state(user)
+        if not state['count']:
             return Response('У Вас отсутствует Shopping_cart',
                             status=HTTP_400_BAD_REQUEST)
 
-        ingredients = IngredientsRecipe.objects.filter(
-            recipes__shopping_cart__user=request.user
-        ).values(
-            'ingredients__name',
-            'ingredients__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        date = datetime.today()
-        shopping_list = (
-            f'Список покупок для: {user.get_full_name()}\n\n'
-            f'Дата: {date:%Y-%m-%d}\n\n'
-        )
-        shopping_list += '\n'.join([
-            f'- {ingredient["ingredients__name"]} '
-            f'({ingredient["ingredients__measurement_unit"]})'
-            f' - {ingredient["amount"]}'
-            for ingredient in ingredients
-        ])
-
-        filename = f'{user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        etag = quote_etag(get_cart_etag(user, state, file_format))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        content_type, render = SHOPPING_LIST_FORMATS[file_format]
+        filename = f'{user.username}_shopping_list.{file_format}'
+        response = StreamingHttpResponse(
+            render(user, get_cart_ingredients(user)),
+            content_type=content_type)
         response['Content-Disposition'] = f'attachment; filename={filename}'
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
 
         return response
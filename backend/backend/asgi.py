@@ -0,0 +1,19 @@
+"""
+ASGI config for backend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Views of the API and streaming responses run in a bounded thread pool,
+see api/executor.py.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from api.executor import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
+application = get_asgi_application()
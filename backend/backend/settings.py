@@ -54,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,7 +91,8 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # django.db.backends.sqlite3 - для замеров без PostgreSQL.
+        'ENGINE': os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
@@ -99,6 +102,75 @@ DATABASES = {
 }
 
 
+# Общий кэш (memcached в docker-compose) и кэш в памяти процесса перед ним
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram-shared'),
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram-local',
+    },
+}
+
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', 60 * 60))
+
+# Избранное, корзина и подписки пользователя между запросами; 0 - не кэшировать.
+USER_RELATIONS_CACHE_TIMEOUT = int(
+    os.getenv('USER_RELATIONS_CACHE_TIMEOUT', 5 * 60))
+
+# Готовые ответы списка и страницы рецепта для анонимов.
+RECIPES_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv('RECIPES_RESPONSE_CACHE_TIMEOUT', 10 * 60))
+
+# Популярность за последние дни: окно и период полураспада веса добавления
+# в избранное, часы. Пересчитывается командой update_trending.
+TRENDING_WINDOW_HOURS = 7 * 24
+TRENDING_HALF_LIFE_HOURS = 24
+
+# Материализованная лента подписок (fan-out при публикации рецепта).
+FEED_MATERIALIZED = os.getenv('FEED_MATERIALIZED', 'False') == 'True'
+FEED_MATERIALIZED_MIN_FOLLOWING = int(
+    os.getenv('FEED_MATERIALIZED_MIN_FOLLOWING', 100))
+
+# Предел id в пакетных запросах к избранному, корзине и подпискам.
+BULK_RELATIONS_MAX_IDS = 100
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = 10
+INGREDIENT_AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Доля запросов, для которых пишутся Server-Timing и лог api.profiling
+# (SQL, повторы запросов, сериализаторы); 0 - профилирование выключено.
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+
+# Метрики Prometheus на /metrics. У нескольких воркеров gunicorn задайте
+# общий для них каталог METRICS_DIR, иначе каждый отдаёт только свои.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+
+# Под ASGI (backend/asgi.py) представления API выполняются в пуле потоков
+# такого размера; соединений с БД на воркер может быть столько же.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_VIEWS_THREADS = int(os.getenv('ASYNC_VIEWS_THREADS', 16))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.profiling': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -141,10 +213,29 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 
+INGREDIENTS_DATA_PATH = os.path.join(BASE_DIR, 'data', 'ingredients.csv')
+
 
 # MEDIA_URL = '/media/'
 # MEDIA_ROOT = '/media'
 
+# Копии картинок рецептов: имя размера -> максимальная ширина в пикселях.
+# Строятся командой process_images.
+RECIPE_IMAGE_SIZES = {
+    'small': 320,
+    'medium': 640,
+    'large': 1280,
+}
+RECIPE_IMAGE_LIST_SIZE = 'medium'
+RECIPE_IMAGE_DETAIL_SIZE = 'large'
+RECIPE_IMAGE_SHORT_SIZE = 'small'
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+RECIPE_IMAGE_JOB_MAX_ATTEMPTS = 3
+# Пауза перед повтором задания, секунды; удваивается с каждой попыткой.
+RECIPE_IMAGE_JOB_RETRY_DELAY = 60
+RECIPE_IMAGE_JOB_STALE_AFTER = 10 * 60
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -159,6 +250,11 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 7
 }
 
+# Для выборок больше порога вместо COUNT(*) берётся оценка планировщика
+# PostgreSQL; 0 - всегда считать точно.
+PAGINATION_ESTIMATED_COUNT_THRESHOLD = int(
+    os.getenv('PAGINATION_ESTIMATED_COUNT_THRESHOLD', 0))
+
 DJOSER = {
     'SERIALIZERS': {
         'user': 'api.serializers.CustomUserSerializer',
@@ -171,3 +267,9 @@ DJOSER = {
     },
     'HIDE_USERS': False,
 }
+
+# Шрифт с кириллицей для выгрузки списка покупок в PDF
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
@@ -2,7 +2,9 @@ from django.contrib import admin
 
 from .models import (Tag, IngredientsBd,
                      IngredientsRecipe,
-                     Recipe, FollowRecipes, ShoppingCart)
+                     Recipe, FollowRecipes, ShoppingCart,
+                     RecipeImageJob)
+from .search import update_search_vectors
 
 
 @admin.register(Tag)
@@ -18,18 +20,27 @@ class IngredientsBdAdmin(admin.ModelAdmin):
 
 @admin.register(IngredientsRecipe)
 class IngredientsRecipeAdmin(admin.ModelAdmin):
-    list_display = ('ingredients', 'amount', )
+    list_display = ('recipe', 'ingredient', 'amount', )
+
+
+class IngredientsRecipeInline(admin.TabularInline):
+    model = IngredientsRecipe
+    min_num = 1
+    extra = 0
 
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'favorites_recipe')
-    readonly_fields = ('favorites_recipe',)
+    list_display = ('name', 'author', 'favorites_count', 'in_carts_count')
+    inlines = (IngredientsRecipeInline,)
+    readonly_fields = ('favorites_count', 'in_carts_count')
     list_filter = ('name', 'author',)
     empty_value_display = '-пусто-'
 
-    def favorites_recipe(self, obj):
-        return obj.follow_recipes.count()
+    def save_related(self, request, form, formsets, change):
+        # Состав сохраняется после рецепта, вектор пересчитывается после.
+        super().save_related(request, form, formsets, change)
+        update_search_vectors([form.instance.id])
 
 
 @admin.register(FollowRecipes)
@@ -40,3 +51,10 @@ class FollowRecipesAdmin(admin.ModelAdmin):
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user', )
+
+
+@admin.register(RecipeImageJob)
+class RecipeImageJobAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'status', 'attempts', 'run_after', 'updated', )
+    list_filter = ('status', )
+    readonly_fields = ('error', )
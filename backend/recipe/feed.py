@@ -0,0 +1,95 @@
+"""Лента рецептов авторов, на которых подписан пользователь.
+
+Два способа получить ленту:
+
+* выборка рецептов по подзапросу к подпискам (всегда доступна);
+* материализованная таблица FeedEntry: при публикации рецепт
+  раскладывается по лентам всех подписчиков одним INSERT ... SELECT.
+  Включается FEED_MATERIALIZED и используется для пользователей с
+  числом подписок от FEED_MATERIALIZED_MIN_FOLLOWING - им выборка по
+  подпискам обходится дороже всего.
+
+После включения материализации таблицу нужно заполнить командой
+rebuild_feed.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from users.models import FollowAuthor
+from .models import FeedEntry, Recipe
+
+FEED_PUB_DATE = 'feed_pub_date'
+
+
+def is_materialized():
+    return settings.FEED_MATERIALIZED
+
+
+def use_materialized(following_count):
+    return (is_materialized() and following_count
+            >= settings.FEED_MATERIALIZED_MIN_FOLLOWING)
+
+
+def get_feed(queryset, user, materialized=False):
+    if materialized:
+        return queryset.filter(feed_entries__user=user).annotate(
+            **{FEED_PUB_DATE: F('feed_entries__pub_date')})
+    return queryset.filter(author__in=FollowAuthor.objects.filter(
+        user=user).values('author'))
+
+
+def table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def insert_entries(select_sql, params):
+    """Добавляет записи ленты из SELECT user_id, recipe_id, author_id,
+    pub_date; уже существующие пропускаются."""
+    sql = (
+        f'INSERT INTO {table(FeedEntry)} '
+        f'(user_id, recipe_id, author_id, pub_date) {select_sql} '
+        f'ON CONFLICT DO NOTHING'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def fan_out(recipe):
+    """Раскладывает новый рецепт по лентам подписчиков автора."""
+    if not is_materialized():
+        return 0
+    return insert_entries(
+        f'SELECT user_id, %s, %s, %s FROM {table(FollowAuthor)} '
+        f'WHERE author_id = %s',
+        [recipe.id, recipe.author_id,
+         Recipe._meta.get_field('pub_date').get_db_prep_value(
+             recipe.pub_date, connection),
+         recipe.author_id])
+
+
+def follows_changed(user_id, author_ids, delta):
+    """Добавляет в ленту рецепты новых авторов или убирает отписанных."""
+    if not is_materialized() or not author_ids:
+        return
+    if delta < 0:
+        FeedEntry.objects.filter(
+            user_id=user_id, author_id__in=author_ids).delete()
+        return
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    insert_entries(
+        f'SELECT %s, id, author_id, pub_date FROM {table(Recipe)} '
+        f'WHERE author_id IN ({placeholders})',
+        [user_id, *author_ids])
+
+
+def rebuild():
+    """Заполняет таблицу ленты заново по текущим подпискам."""
+    FeedEntry.objects.all().delete()
+    return insert_entries(
+        f'SELECT follow.user_id, recipe.id, recipe.author_id, '
+        f'recipe.pub_date FROM {table(FollowAuthor)} AS follow '
+        f'INNER JOIN {table(Recipe)} AS recipe '
+        f'ON recipe.author_id = follow.author_id WHERE 1 = 1',
+        [])
@@ -0,0 +1,116 @@
+"""Очередь обработки картинок рецептов.
+
+Картинка из запроса сохраняется как есть, а для рецепта ставится задание
+RecipeImageJob. Команда process_images забирает задания из базы и строит
+копии разных размеров в пуле процессов. Пока копий нет, API отдаёт
+исходную картинку. Неудачное задание повторяется с растущей паузой.
+"""
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Recipe, RecipeImageJob, RecipeImageRendition
+from .renditions import RENDITION_FORMATS
+
+
+def schedule_image_processing(recipe):
+    if recipe.image:
+        RecipeImageJob.objects.create(recipe=recipe, source=recipe.image.name)
+
+
+def get_rendition(recipe, size, image_format):
+    """Копия текущей картинки рецепта; использует prefetch renditions."""
+    for rendition in recipe.renditions.all():
+        if (rendition.source == recipe.image.name
+                and rendition.size == size
+                and rendition.format == image_format):
+            return rendition
+    return None
+
+
+def requeue_stale_jobs():
+    """Возвращает в очередь задания упавших обработчиков."""
+    stale = timezone.now() - timedelta(
+        seconds=settings.RECIPE_IMAGE_JOB_STALE_AFTER)
+    return RecipeImageJob.objects.filter(
+        status=RecipeImageJob.PROCESSING, updated__lt=stale
+    ).update(status=RecipeImageJob.PENDING)
+
+
+def claim_jobs(limit):
+    with transaction.atomic():
+        jobs = list(
+            RecipeImageJob.objects.select_for_update(skip_locked=True)
+            .filter(status=RecipeImageJob.PENDING,
+                    run_after__lte=timezone.now())
+            .select_related('recipe')[:limit]
+        )
+        for job in jobs:
+            job.status = RecipeImageJob.PROCESSING
+            job.attempts += 1
+            job.updated = timezone.now()
+        RecipeImageJob.objects.bulk_update(
+            jobs, ('status', 'attempts', 'updated'))
+    return jobs
+
+
+def read_source(job):
+    """Байты исходной картинки или None, если задание устарело."""
+    recipe = job.recipe
+    if recipe.image.name != job.source:
+        return None
+    with recipe.image.open('rb') as image:
+        return image.read()
+
+
+def finish_job(job, status, error=''):
+    job.status = status
+    job.error = error
+    job.save(update_fields=('status', 'error', 'updated'))
+
+
+def fail_job(job, error):
+    if job.attempts >= settings.RECIPE_IMAGE_JOB_MAX_ATTEMPTS:
+        finish_job(job, RecipeImageJob.FAILED, str(error))
+        return
+    job.run_after = timezone.now() + timedelta(
+        seconds=settings.RECIPE_IMAGE_JOB_RETRY_DELAY
+        * 2 ** (job.attempts - 1))
+    job.status = RecipeImageJob.PENDING
+    job.error = str(error)
+    job.save(update_fields=('status', 'error', 'run_after', 'updated'))
+
+
+def delete_files(files):
+    for file in files:
+        file.delete(save=False)
+
+
+@transaction.atomic
+def save_renditions(job, renditions):
+    recipe = Recipe.objects.select_for_update().get(id=job.recipe_id)
+    if recipe.image.name != job.source:
+        finish_job(job, RecipeImageJob.DONE, 'Картинка рецепта изменилась.')
+        return
+    old = list(recipe.renditions.all())
+    created = []
+    for size, image_format, data, width, height in renditions:
+        extension = RENDITION_FORMATS[image_format][1]
+        rendition = RecipeImageRendition(
+            recipe=recipe, source=job.source, size=size,
+            format=image_format, width=width, height=height)
+        rendition.image.save(f'{recipe.id}_{size}.{extension}',
+                             ContentFile(data), save=False)
+        created.append(rendition)
+    # Файлы удаляются только после коммита: при откате старые копии
+    # останутся в базе и должны остаться на диске.
+    old_files = [rendition.image for rendition in old]
+    transaction.on_commit(partial(delete_files, old_files))
+    RecipeImageRendition.objects.filter(
+        id__in=[rendition.id for rendition in old]).delete()
+    RecipeImageRendition.objects.bulk_create(created)
+    finish_job(job, RecipeImageJob.DONE)
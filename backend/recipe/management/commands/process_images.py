@@ -0,0 +1,64 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from recipe.images import (claim_jobs, fail_job, finish_job, read_source,
+                           requeue_stale_jobs, save_renditions)
+from recipe.models import RecipeImageJob
+from recipe.renditions import render_renditions
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь картинок рецептов в пуле процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+        parser.add_argument('--once', action='store_true',
+                            help='Обработать очередь и завершиться.')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f'Возвращено в очередь: {requeued}')
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                close_old_connections()
+                jobs = claim_jobs(options['batch_size'])
+                if jobs:
+                    self.process(pool, jobs)
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+
+    def process(self, pool, jobs):
+        futures = {}
+        for job in jobs:
+            try:
+                data = read_source(job)
+            except OSError as error:
+                fail_job(job, error)
+                continue
+            if data is None:
+                finish_job(job, RecipeImageJob.DONE,
+                           'Картинка рецепта изменилась.')
+                continue
+            future = pool.submit(
+                render_renditions, data,
+                settings.RECIPE_IMAGE_SIZES, settings.RECIPE_IMAGE_QUALITY)
+            futures[future] = job
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                save_renditions(job, future.result())
+            except Exception as error:
+                fail_job(job, error)
+                self.stderr.write(f'Рецепт {job.recipe_id}: {error}')
+            else:
+                self.stdout.write(f'Рецепт {job.recipe_id}: готово')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipe.feed import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Заполняет материализованную ленту подписок заново.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            entries = rebuild()
+        self.stdout.write(f'Записей в лентах: {entries}')
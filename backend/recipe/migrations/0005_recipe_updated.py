@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-18 17:04
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0004_alter_tag_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientsrecipe',
+            name='amount',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MaxValueValidator(10000), django.core.validators.MinValueValidator(1)], verbose_name='количество ингридиента'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 17:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0005_recipe_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredientsrecipe',
+            name='recipe',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipe.recipe', verbose_name='рецепт'),
+        ),
+    ]
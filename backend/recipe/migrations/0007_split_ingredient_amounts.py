@@ -0,0 +1,53 @@
+# Generated by Django 3.2 on 2026-10-18 17:20
+
+from django.db import migrations
+
+
+def split_shared_amounts(apps, schema_editor):
+    """Общие строки ингредиент+количество -> строки конкретного рецепта."""
+    Recipe = apps.get_model('recipe', 'Recipe')
+    IngredientsRecipe = apps.get_model('recipe', 'IngredientsRecipe')
+    links = Recipe.ingredients.through.objects.select_related(
+        'ingredientsrecipe')
+    amounts = {}
+    for link in links.iterator():
+        key = (link.recipe_id, link.ingredientsrecipe.ingredients_id)
+        amounts[key] = amounts.get(key, 0) + link.ingredientsrecipe.amount
+    IngredientsRecipe.objects.all().delete()
+    IngredientsRecipe.objects.bulk_create(
+        [
+            IngredientsRecipe(recipe_id=recipe_id,
+                              ingredients_id=ingredient_id,
+                              amount=amount)
+            for (recipe_id, ingredient_id), amount in amounts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+def link_shared_amounts(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    IngredientsRecipe = apps.get_model('recipe', 'IngredientsRecipe')
+    Through = Recipe.ingredients.through
+    Through.objects.bulk_create(
+        [
+            Through(recipe_id=recipe_id, ingredientsrecipe_id=row_id)
+            for row_id, recipe_id in IngredientsRecipe.objects.values_list(
+                'id', 'recipe_id').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    # Данные переносятся отдельной миграцией: в PostgreSQL таблицу с
+    # отложенными проверками внешних ключей нельзя менять в той же
+    # транзакции.
+
+    dependencies = [
+        ('recipe', '0006_ingredientsrecipe_recipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_shared_amounts, link_shared_amounts),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2 on 2026-10-18 17:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0007_split_ingredient_amounts'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recipe',
+            name='ingredients',
+        ),
+        migrations.AlterField(
+            model_name='ingredientsrecipe',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipe.recipe', verbose_name='рецепт'),
+        ),
+        migrations.RenameField(
+            model_name='ingredientsrecipe',
+            old_name='ingredients',
+            new_name='ingredient',
+        ),
+        migrations.AlterField(
+            model_name='ingredientsrecipe',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipe.ingredientsbd', verbose_name='ингредиент'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientsrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients',
+            field=models.ManyToManyField(related_name='recipes', through='recipe.IngredientsRecipe', to='recipe.IngredientsBd', verbose_name='Ингредиенты'),
+        ),
+    ]
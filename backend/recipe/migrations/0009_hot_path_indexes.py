@@ -0,0 +1,33 @@
+# Generated by Django 3.2 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0008_ingredientsrecipe_per_recipe'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='followrecipes',
+            index=models.Index(fields=['recipes', 'user'], name='follow_recipes_recipe_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredientsbd',
+            index=models.Index(fields=['name'], name='ingredient_name_pattern_idx', opclasses=('varchar_pattern_ops',)),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['recipe', 'user'], name='shopping_cart_recipe_user_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2 on 2026-10-18 17:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0009_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=200, verbose_name='исходная картинка')),
+                ('size', models.CharField(max_length=16, verbose_name='размер')),
+                ('format', models.CharField(max_length=16, verbose_name='формат')),
+                ('image', models.ImageField(upload_to='recipes/renditions/', verbose_name='Картинка')),
+                ('width', models.PositiveIntegerField(verbose_name='ширина')),
+                ('height', models.PositiveIntegerField(verbose_name='высота')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='recipe.recipe', verbose_name='рецепт')),
+            ],
+            options={
+                'verbose_name': 'Копия картинки',
+                'verbose_name_plural': 'Копии картинок',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=200, verbose_name='исходная картинка')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='попытки')),
+                ('error', models.TextField(blank=True, verbose_name='ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='создано')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='изменено')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='recipe.recipe', verbose_name='рецепт')),
+            ],
+            options={
+                'verbose_name': 'Обработка картинки',
+                'verbose_name_plural': 'Обработка картинок',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipeimagerendition',
+            constraint=models.UniqueConstraint(fields=('recipe', 'source', 'size', 'format'), name='unique_recipe_rendition'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeimagejob',
+            index=models.Index(fields=['status', 'id'], name='image_job_status_idx'),
+        ),
+    ]
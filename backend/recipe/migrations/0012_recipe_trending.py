@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-18 17:27
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.utils.timezone
+
+
+def date_existing_favorites(apps, schema_editor):
+    """Время старых добавлений неизвестно: берём дату публикации рецепта,
+    чтобы они не попали в окно популярности все разом."""
+    Recipe = apps.get_model('recipe', 'Recipe')
+    FollowRecipes = apps.get_model('recipe', 'FollowRecipes')
+    FollowRecipes.objects.update(created=Subquery(
+        Recipe.objects.filter(pk=OuterRef('recipes')).values('pub_date')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0011_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='followrecipes',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='добавлено'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(date_existing_favorites,
+                             migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность за последние дни'),
+        ),
+        migrations.AddIndex(
+            model_name='followrecipes',
+            index=models.Index(fields=['created'], name='follow_recipes_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-id'], name='recipe_trending_score_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2 on 2026-10-18 17:34
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# GIN-индекс и заполнение - только для PostgreSQL, в SQLite поиск идёт
+# через icontains (см. recipe/search.py).
+CREATE_INDEX = (
+    'CREATE INDEX recipe_search_vector_idx ON recipe_recipe '
+    'USING GIN (search_vector)'
+)
+DROP_INDEX = 'DROP INDEX IF EXISTS recipe_search_vector_idx'
+FILL_VECTORS = """
+UPDATE recipe_recipe AS recipe SET search_vector =
+    setweight(to_tsvector('russian', coalesce(recipe.name, '')), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipe_ingredientsrecipe AS amount
+        INNER JOIN recipe_ingredientsbd AS ingredient
+            ON ingredient.id = amount.ingredient_id
+        WHERE amount.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', coalesce(recipe.text, '')), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(FILL_VECTORS)
+        schema_editor.execute(CREATE_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0013_feed_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
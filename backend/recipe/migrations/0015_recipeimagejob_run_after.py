@@ -0,0 +1,19 @@
+# Generated by Django 3.2 on 2026-10-18 18:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0014_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeimagejob',
+            name='run_after',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='не раньше'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from colorfield.fields import ColorField
 from django.db import models
+from django.utils import timezone
 
 from .consts import LEN_CONST_NORM, LEN_CONST_SMALL
 
@@ -35,31 +37,17 @@ class IngredientsBd (models.Model):
 
     class Meta:
         ordering = ('name', )
+        indexes = [
+            models.Index(
+                fields=('name',),
+                name='ingredient_name_pattern_idx',
+                opclasses=('varchar_pattern_ops',)
+            ),
+        ]
         verbose_name = 'База данный ингридиентов'
         verbose_name_plural = 'База данный ингридиентов'
 
 
-class IngredientsRecipe(models.Model):
-    """Ингридиенты колличество. Для модели рецепта"""
-    ingredients = models.ForeignKey(
-        IngredientsBd,
-        on_delete=models.CASCADE,
-        related_name='ingredients_recipe')
-    amount = models.PositiveIntegerField(
-        default=1, verbose_name='количество ингридиента',
-        validators=[
-            MaxValueValidator(10000),
-            MinValueValidator(1)
-        ])
-
-    def __str__(self) -> str:
-        return f'{self.ingredients}, {self.amount}'
-
-    class Meta:
-        verbose_name = 'Ингридиенты в рецепте'
-        verbose_name_plural = 'Ингридиенты в рецепте'
-
-
 class Recipe(models.Model):
     """Рецепт"""
     author = models.ForeignKey(
@@ -71,8 +59,10 @@ class Recipe(models.Model):
         blank=True
     )
     text = models.TextField(verbose_name='Описание')
-    ingredients = models.ManyToManyField(IngredientsRecipe,
-                                         related_name='recipes')
+    ingredients = models.ManyToManyField(IngredientsBd,
+                                         through='IngredientsRecipe',
+                                         related_name='recipes',
+                                         verbose_name='Ингредиенты')
     cooking_time = models.PositiveIntegerField(
         verbose_name='Время приготовления', validators=[
             MaxValueValidator(10000),
@@ -80,18 +70,71 @@ class Recipe(models.Model):
         ])
     pub_date = models.DateTimeField(verbose_name='Дата публикации',
                                     auto_now_add=True)
+    updated = models.DateTimeField(verbose_name='Дата изменения',
+                                   auto_now=True)
     tags = models.ManyToManyField(Tag, related_name='recipes',
                                   verbose_name='Тег')
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном', default=0, editable=False)
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок', default=0, editable=False)
+    trending_score = models.FloatField(
+        verbose_name='Популярность за последние дни', default=0,
+        editable=False)
+    # Заполняется recipe.search.update_search_vectors, только в PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self) -> str:
         return f'{self.name} - {self.author}'
 
     class Meta:
         ordering = ('-pub_date', )
+        indexes = [
+            models.Index(fields=('-pub_date',), name='recipe_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date'),
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=('-favorites_count', '-id'),
+                         name='recipe_favorites_count_idx'),
+            models.Index(fields=('-trending_score', '-id'),
+                         name='recipe_trending_score_idx'),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
 
+class IngredientsRecipe(models.Model):
+    """Ингридиенты колличество. Для модели рецепта"""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='recipe_ingredients',
+        verbose_name='рецепт')
+    ingredient = models.ForeignKey(
+        IngredientsBd,
+        on_delete=models.CASCADE,
+        related_name='recipe_ingredients',
+        verbose_name='ингредиент')
+    amount = models.PositiveIntegerField(
+        default=1, verbose_name='количество ингридиента',
+        validators=[
+            MaxValueValidator(10000),
+            MinValueValidator(1)
+        ])
+
+    def __str__(self) -> str:
+        return f'{self.ingredient}, {self.amount}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipe_ingredient'
+            )
+        ]
+        verbose_name = 'Ингридиенты в рецепте'
+        verbose_name_plural = 'Ингридиенты в рецепте'
+
+
 class FollowRecipes(models.Model):
     """Подписка на рецепты"""
     recipes = models.ForeignKey(Recipe,
@@ -102,6 +145,8 @@ class FollowRecipes(models.Model):
                              on_delete=models.CASCADE,
                              related_name='follow_recipes',
                              verbose_name='пользователь')
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='добавлено')
 
     class Meta:
         ordering = ('user', )
@@ -111,6 +156,12 @@ class FollowRecipes(models.Model):
                 name='unique_follow_recipes'
             )
         ]
+        indexes = [
+            models.Index(fields=('recipes', 'user'),
+                         name='follow_recipes_recipe_user_idx'),
+            models.Index(fields=('created',),
+                         name='follow_recipes_created_idx'),
+        ]
         verbose_name = 'Рецепт подписка'
         verbose_name_plural = 'Подписки на рецепты'
 
@@ -140,3 +191,120 @@ class ShoppingCart(models.Model):
                 name='unique_shopping_cart'
             )
         ]
+        indexes = [
+            models.Index(fields=('recipe', 'user'),
+                         name='shopping_cart_recipe_user_idx'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписок пользователя (fan-out при публикации)"""
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='рецепт',
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='автор',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-recipe'),
+                         name='feed_entry_user_pub_date_idx'),
+            models.Index(fields=('user', 'author'),
+                         name='feed_entry_user_author_idx'),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+
+
+class RecipeImageJob(models.Model):
+    """Задание на обработку картинки рецепта"""
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Обрабатывается'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='image_jobs',
+        verbose_name='рецепт',
+    )
+    source = models.CharField(max_length=LEN_CONST_NORM,
+                              verbose_name='исходная картинка')
+    status = models.CharField(max_length=LEN_CONST_SMALL,
+                              choices=STATUS_CHOICES, default=PENDING,
+                              verbose_name='статус')
+    attempts = models.PositiveSmallIntegerField(default=0,
+                                                verbose_name='попытки')
+    error = models.TextField(blank=True, verbose_name='ошибка')
+    run_after = models.DateTimeField(default=timezone.now,
+                                     verbose_name='не раньше')
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='создано')
+    updated = models.DateTimeField(auto_now=True, verbose_name='изменено')
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.source} ({self.status})'
+
+    class Meta:
+        ordering = ('id', )
+        indexes = [
+            models.Index(fields=('status', 'id'),
+                         name='image_job_status_idx'),
+        ]
+        verbose_name = 'Обработка картинки'
+        verbose_name_plural = 'Обработка картинок'
+
+
+class RecipeImageRendition(models.Model):
+    """Уменьшенная копия картинки рецепта"""
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='renditions',
+        verbose_name='рецепт',
+    )
+    source = models.CharField(max_length=LEN_CONST_NORM,
+                              verbose_name='исходная картинка')
+    size = models.CharField(max_length=LEN_CONST_SMALL,
+                            verbose_name='размер')
+    format = models.CharField(max_length=LEN_CONST_SMALL,
+                              verbose_name='формат')
+    image = models.ImageField(upload_to='recipes/renditions/',
+                              verbose_name='Картинка')
+    width = models.PositiveIntegerField(verbose_name='ширина')
+    height = models.PositiveIntegerField(verbose_name='высота')
+
+    def __str__(self):
+        return f'{self.source} {self.size}.{self.format}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'source', 'size', 'format'),
+                name='unique_recipe_rendition'
+            )
+        ]
+        verbose_name = 'Копия картинки'
+        verbose_name_plural = 'Копии картинок'
@@ -0,0 +1,41 @@
+"""Построение уменьшенных копий картинки.
+
+Модуль не зависит от Django: функция render_renditions выполняется в
+дочерних процессах пула и получает на вход только байты картинки.
+"""
+import io
+
+from PIL import Image, ImageOps
+
+# формат в API -> (формат Pillow, расширение файла)
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+
+def to_rgb(image):
+    """JPEG не поддерживает прозрачность: кладём картинку на белый фон."""
+    if image.mode == 'RGB':
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def render_renditions(data, sizes, quality):
+    """Возвращает список (размер, формат, байты, ширина, высота)."""
+    with Image.open(io.BytesIO(data)) as source:
+        source.load()
+        image = to_rgb(ImageOps.exif_transpose(source))
+    renditions = []
+    for size, width in sizes.items():
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.LANCZOS)
+        for image_format, (pillow_format, _) in RENDITION_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pillow_format, quality=quality)
+            renditions.append((size, image_format, buffer.getvalue(),
+                               resized.width, resized.height))
+    return renditions
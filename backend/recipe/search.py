@@ -0,0 +1,73 @@
+"""Полнотекстовый поиск рецептов.
+
+В PostgreSQL у рецепта хранится tsvector (конфигурация russian) с весами:
+название - A, ингредиенты - B, описание - C. Колонка обновляется при
+сохранении рецепта и его состава, по ней построен GIN-индекс, а
+результаты сортируются по ts_rank. На других СУБД (SQLite в тестах и
+локальной разработке) поиск сводится к icontains, а выше оказываются
+рецепты с совпадением в названии; регистр SQLite игнорирует только для
+латиницы.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import (Case, F, FloatField, OuterRef, Q, Subquery,
+                              Value, When)
+from django.db.models.functions import Cast, Coalesce
+
+from .models import IngredientsRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+SEARCH_RANK = 'search_rank'
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def build_vector():
+    names = IngredientsRecipe.objects.filter(
+        recipe_id=OuterRef('pk')
+    ).order_by().values('recipe_id').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Coalesce(Subquery(names), Value('')),
+                       weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids=None):
+    """Пересчитывает search_vector рецептов одним UPDATE; None - всех."""
+    if not is_supported() or recipe_ids == []:
+        return
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+    recipes.update(search_vector=build_vector())
+
+
+def search(queryset, value):
+    """Рецепты по запросу с аннотацией search_rank для сортировки."""
+    if is_supported():
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        # ts_rank возвращает real; в double precision значение из курсора
+        # пагинации сравнивается с колонкой точно.
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+        return queryset.filter(search_vector=query).annotate(
+            **{SEARCH_RANK: rank})
+    by_ingredient = IngredientsRecipe.objects.filter(
+        ingredient__name__icontains=value).values('recipe_id')
+    return queryset.filter(
+        Q(name__icontains=value)
+        | Q(text__icontains=value)
+        | Q(id__in=by_ingredient)
+    ).annotate(**{SEARCH_RANK: Case(
+        When(name__icontains=value, then=Value(1.0)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )})
@@ -0,0 +1,253 @@
+"""Синтетические данные для нагрузочных замеров.
+
+Все записи создаются пачками через bulk_create, генератор случайных чисел
+инициализируется seed, поэтому один и тот же набор параметров даёт одни и
+те же данные.
+
+По умолчанию авторы, рецепты, ингредиенты и теги выбираются равномерно.
+С параметром zipf вероятность выбрать k-й по популярности элемент
+пропорциональна 1 / k ** zipf: немного активных пользователей, популярных
+рецептов, авторов и ингредиентов и длинный хвост остальных.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from users.models import FollowAuthor
+from .models import (FollowRecipes, IngredientsBd, IngredientsRecipe,
+                     Recipe, ShoppingCart, Tag)
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+# Префиксы имён пользователей и тегов. Данные generate_data остаются в
+# базе, а команды замеров создают свои в откатываемой транзакции рядом с
+# ними, поэтому имена не должны совпадать.
+PREFIX = 'synthetic'
+BENCHMARK_PREFIX = 'benchmark'
+PUB_DATE_SPREAD = timedelta(days=365)
+# Сколько раз добирать недостающие уникальные пары: при сильном перекосе
+# популярных пар мало и набрать заданное число бывает невозможно.
+PAIR_ROUNDS = 50
+
+
+@contextmanager
+def explicit_dates():
+    """Позволяет задать pub_date/updated вместо auto_now(_add)."""
+    fields = [Recipe._meta.get_field(name) for name in ('pub_date', 'updated')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def unique_pairs(count, pick_left, pick_right, limit, exclude_same=False):
+    """До count различных пар; pick_* возвращают k случайных элементов."""
+    pairs = set()
+    target = min(count, limit)
+    for _ in range(PAIR_ROUNDS):
+        missing = target - len(pairs)
+        if missing <= 0:
+            break
+        pairs.update(
+            pair for pair in zip(pick_left(missing), pick_right(missing))
+            if not exclude_same or pair[0] != pair[1])
+    return list(pairs)[:target]
+
+
+class SyntheticDataset:
+    def __init__(self, users=100, recipes=1000, ingredients=500, tags=5,
+                 ingredients_per_recipe=8, favorites=5000, carts=2000,
+                 follows=1000, seed=0, batch_size=BATCH_SIZE, zipf=None,
+                 catalogue=False, prefix=PREFIX):
+        self.counts = {
+            'users': users,
+            'recipes': recipes,
+            'ingredients': ingredients,
+            'tags': tags,
+            'favorites': favorites,
+            'carts': carts,
+            'follows': follows,
+        }
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.seed = seed
+        self.batch_size = batch_size
+        self.zipf = zipf
+        # Брать ингредиенты и теги из уже загруженных справочников.
+        self.catalogue = catalogue
+        self.rng = random.Random(seed)
+        self.prefix = f'{prefix}{seed}'
+
+    def sampler(self, population):
+        """Функция k -> k элементов population с повторами.
+
+        При zipf популярность задаётся случайной перестановкой, чтобы
+        самыми популярными не оказывались первые созданные записи.
+        """
+        population = list(population)
+        if not self.zipf:
+            return lambda k: self.rng.choices(population, k=k)
+        self.rng.shuffle(population)
+        cum_weights = list(accumulate(
+            1 / rank ** self.zipf for rank in range(1, len(population) + 1)))
+        return lambda k: self.rng.choices(
+            population, cum_weights=cum_weights, k=k)
+
+    def sample_unique(self, pick, count):
+        """count различных элементов через pick."""
+        chosen = []
+        while len(chosen) < count:
+            for item in pick(count - len(chosen)):
+                if item not in chosen:
+                    chosen.append(item)
+        return chosen[:count]
+
+    def bulk_create(self, model, objects):
+        for chunk in chunks(objects, self.batch_size):
+            model.objects.bulk_create(chunk)
+
+    def create_users(self):
+        User.objects.bulk_create(
+            [
+                User(username=f'{self.prefix}_{i}',
+                     email=f'{self.prefix}_{i}@example.com',
+                     first_name='Тест', last_name=str(i), password='!')
+                for i in range(self.counts['users'])
+            ],
+            batch_size=self.batch_size,
+        )
+        return list(User.objects.filter(
+            username__startswith=f'{self.prefix}_'
+        ).values_list('id', flat=True))
+
+    def create_ingredients(self):
+        if self.catalogue:
+            return list(IngredientsBd.objects.values_list('id', flat=True))
+        existing = list(IngredientsBd.objects.values_list('id', flat=True))
+        missing = self.counts['ingredients'] - len(existing)
+        if missing > 0:
+            IngredientsBd.objects.bulk_create(
+                [
+                    IngredientsBd(name=f'ингредиент {self.seed}-{i}',
+                                  measurement_unit='г')
+                    for i in range(missing)
+                ],
+                batch_size=self.batch_size,
+            )
+            existing = list(
+                IngredientsBd.objects.values_list('id', flat=True))
+        return existing
+
+    def create_tags(self):
+        if self.catalogue:
+            return list(Tag.objects.values_list('id', flat=True))
+        Tag.objects.bulk_create(
+            [
+                Tag(name=f'{self.prefix} тег {i}',
+                    slug=f'{self.prefix}-tag-{i}',
+                    color=f'#{self.seed % 256:02X}{i // 256:02X}{i % 256:02X}')
+                for i in range(self.counts['tags'])
+            ],
+            ignore_conflicts=True,
+        )
+        return list(Tag.objects.filter(
+            slug__startswith=f'{self.prefix}-tag-'
+        ).values_list('id', flat=True))
+
+    def create_recipes(self, authors):
+        now = timezone.now()
+        pick_author = self.sampler(authors)
+        with explicit_dates():
+            for start in range(0, self.counts['recipes'], self.batch_size):
+                stop = min(start + self.batch_size, self.counts['recipes'])
+                recipes = []
+                for i, author_id in zip(range(start, stop),
+                                        pick_author(stop - start)):
+                    pub_date = now - self.rng.random() * PUB_DATE_SPREAD
+                    recipes.append(Recipe(
+                        author_id=author_id,
+                        name=f'Рецепт {i}',
+                        text='Синтетический рецепт для нагрузочных замеров.',
+                        cooking_time=self.rng.randint(5, 180),
+                        pub_date=pub_date,
+                        updated=pub_date,
+                    ))
+                Recipe.objects.bulk_create(recipes)
+        return list(Recipe.objects.filter(
+            author_id__in=authors).values_list('id', flat=True))
+
+    def get_ingredients_count(self, available):
+        if not self.zipf:
+            return min(self.ingredients_per_recipe, available)
+        # В среднем ingredients_per_recipe, от половины до полутора.
+        spread = self.ingredients_per_recipe // 2
+        return min(available, self.rng.randint(
+            max(1, self.ingredients_per_recipe - spread),
+            self.ingredients_per_recipe + spread))
+
+    def create_recipe_relations(self, recipes, ingredients, tags):
+        TagThrough = Recipe.tags.through
+        pick_ingredients = self.sampler(ingredients)
+        pick_tags = self.sampler(tags)
+
+        def amounts():
+            for recipe_id in recipes:
+                count = self.get_ingredients_count(len(ingredients))
+                for ingredient_id in self.sample_unique(
+                        pick_ingredients, count):
+                    yield IngredientsRecipe(
+                        recipe_id=recipe_id, ingredient_id=ingredient_id,
+                        amount=self.rng.randint(1, 500))
+
+        def recipe_tags():
+            for recipe_id in recipes:
+                count = min(len(tags), self.rng.randint(1, 2))
+                for tag_id in self.sample_unique(pick_tags, count):
+                    yield TagThrough(recipe_id=recipe_id, tag_id=tag_id)
+
+        self.bulk_create(IngredientsRecipe, amounts())
+        self.bulk_create(TagThrough, recipe_tags())
+
+    def create_user_relations(self, users, recipes):
+        pick_user = self.sampler(users)
+        pick_recipe = self.sampler(recipes)
+        limit = len(users) * len(recipes)
+        self.bulk_create(FollowRecipes, (
+            FollowRecipes(user_id=user_id, recipes_id=recipe_id)
+            for user_id, recipe_id in unique_pairs(
+                self.counts['favorites'], pick_user, pick_recipe, limit)
+        ))
+        self.bulk_create(ShoppingCart, (
+            ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+            for user_id, recipe_id in unique_pairs(
+                self.counts['carts'], pick_user, pick_recipe, limit)
+        ))
+        self.bulk_create(FollowAuthor, (
+            FollowAuthor(user_id=user_id, author_id=author_id)
+            for user_id, author_id in unique_pairs(
+                self.counts['follows'], pick_user, self.sampler(users),
+                len(users) * (len(users) - 1), exclude_same=True)
+        ))
+
+    def generate(self):
+        users = self.create_users()
+        ingredients = self.create_ingredients()
+        tags = self.create_tags()
+        recipes = self.create_recipes(users)
+        self.create_recipe_relations(recipes, ingredients, tags)
+        self.create_user_relations(users, recipes)
+        return users, recipes
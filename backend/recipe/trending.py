@@ -0,0 +1,47 @@
+"""Оценка популярности рецептов за последние дни.
+
+Каждое добавление в избранное внутри окна TRENDING_WINDOW_HOURS даёт
+вес 0.5 ** (возраст / TRENDING_HALF_LIFE_HOURS). Сумма весов хранится в
+Recipe.trending_score и пересчитывается периодически, поэтому сортировка
+по ней стоит столько же, сколько сортировка по дате.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FollowRecipes, Recipe
+
+SCORE_PRECISION = 6
+
+
+def compute_scores(now=None):
+    now = now or timezone.now()
+    window = timedelta(hours=settings.TRENDING_WINDOW_HOURS)
+    half_life = timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+    scores = defaultdict(float)
+    favorites = FollowRecipes.objects.filter(
+        created__gte=now - window
+    ).values_list('recipes_id', 'created')
+    for recipe_id, created in favorites.iterator():
+        scores[recipe_id] += 0.5 ** ((now - created) / half_life)
+    return {recipe_id: round(score, SCORE_PRECISION)
+            for recipe_id, score in scores.items()}
+
+
+def update_trending(now=None, batch_size=1000):
+    """Записывает новые оценки; возвращает число изменённых рецептов."""
+    scores = compute_scores(now)
+    current = dict(Recipe.objects.filter(
+        trending_score__gt=0).values_list('id', 'trending_score'))
+    for recipe_id in current.keys() - scores.keys():
+        scores[recipe_id] = 0
+    changed = [
+        Recipe(id=recipe_id, trending_score=score)
+        for recipe_id, score in scores.items()
+        if current.get(recipe_id, 0) != score
+    ]
+    Recipe.objects.bulk_update(changed, ('trending_score',),
+                               batch_size=batch_size)
+    return len(changed)
@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase
+
+from api.autocomplete import IngredientIndex
+
+INGREDIENTS = (
+    (1, 'Соль', 'г'),
+    (2, 'соль ', 'г'),
+    (3, 'соль  морская', 'г'),
+    (4, 'Соль морская', 'г'),
+    (5, 'соль', 'щепотка'),
+    (6, 'морская капуста', 'г'),
+)
+
+
+class IngredientIndexTest(SimpleTestCase):
+    """Подсказки без повторов, отличающихся регистром или пробелами."""
+
+    def setUp(self):
+        self.index = IngredientIndex([
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in INGREDIENTS
+        ])
+
+    def search(self, query, limit=10):
+        return [item['id'] for item in self.index.search(query, limit)]
+
+    def test_prefix(self):
+        self.assertEqual(self.search('СОЛЬ'), [1, 5, 3])
+        self.assertEqual(self.search('  соль   морская '), [3])
+
+    def test_substring(self):
+        self.assertEqual(self.search('морская'), [6, 3])
+
+    def test_fuzzy(self):
+        self.assertEqual(self.search('Соль морскя'), [3])
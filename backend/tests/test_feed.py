@@ -0,0 +1,79 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipe.models import FeedEntry, Recipe
+from users.models import User
+
+
+class FeedTest(TestCase):
+    """Лента подписок: рецепты появляются при подписке и публикации и
+    пропадают при отписке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader', password='pass',
+            first_name='Читатель', last_name='Тестов')
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                password='pass', first_name='Автор', last_name=str(i))
+            for i in range(2)
+        ]
+        for author in cls.authors:
+            for i in range(2):
+                cls.create_recipe(author, i)
+
+    @staticmethod
+    def create_recipe(author, number):
+        return Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='Описание',
+            cooking_time=10)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_feed(self):
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def get_recipes(self, author):
+        return list(Recipe.objects.filter(author=author).order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+
+    def assert_entries(self, materialized):
+        expected = len(self.get_feed()) if materialized else 0
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.user).count(), expected)
+
+    def assert_feed(self, materialized):
+        author = self.authors[0]
+        url = f'/api/users/{author.id}/subscribe/'
+        self.assertEqual(self.get_feed(), [])
+
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.get_feed(), self.get_recipes(author))
+        self.assert_entries(materialized)
+
+        recipe = self.create_recipe(author, 2)
+        feed = self.get_feed()
+        self.assertEqual(feed[0], recipe.id)
+        self.assertEqual(feed, self.get_recipes(author))
+        self.assert_entries(materialized)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.get_feed(), [])
+        self.assert_entries(materialized)
+
+    def test_join(self):
+        self.assert_feed(materialized=False)
+
+    @override_settings(FEED_MATERIALIZED=True,
+                       FEED_MATERIALIZED_MIN_FOLLOWING=1)
+    def test_materialized(self):
+        self.assert_feed(materialized=True)
@@ -0,0 +1,103 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipe.models import IngredientsBd, IngredientsRecipe, Recipe, Tag
+from recipe.search import is_supported, update_search_vectors
+from users.models import User
+
+
+class RecipeTagFilterTest(TestCase):
+    """Фильтр по тегам: любой или все теги, без повторов рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author', password='pass',
+            first_name='Автор', last_name='Тестов')
+        breakfast, lunch, dinner = (
+            Tag.objects.create(name=slug, color=f'#00000{i}', slug=slug)
+            for i, slug in enumerate(('breakfast', 'lunch', 'dinner')))
+        for name, tags in (('both', (breakfast, lunch)),
+                           ('breakfast', (breakfast,)),
+                           ('lunch', (lunch,)),
+                           ('dinner', (dinner,))):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=10)
+            recipe.tags.set(tags)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+
+    def get_names(self, **params):
+        response = self.client.get(
+            '/api/recipes/', {'tags': ['breakfast', 'lunch'], **params})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_any(self):
+        names = self.get_names()
+        self.assertCountEqual(names, ['both', 'breakfast', 'lunch'])
+        self.assertEqual(names, self.get_names(tags_mode='any'))
+
+    def test_all(self):
+        self.assertEqual(self.get_names(tags_mode='all'), ['both'])
+
+    def test_unknown_tag(self):
+        response = self.client.get(
+            '/api/recipes/', {'tags': ['breakfast', 'brunch']})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.json())
+
+
+class RecipeSearchTest(TestCase):
+    """Поиск по названию, ингредиентам и описанию; совпадение в названии
+    выше остальных."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author', password='pass',
+            first_name='Автор', last_name='Тестов')
+        tomato = IngredientsBd.objects.create(
+            name='tomato', measurement_unit='г')
+        for name, text, ingredient in (
+                ('Tomato soup', 'Описание', None),
+                ('Salad', 'Add one tomato', None),
+                ('Stew', 'Описание', tomato),
+                ('Pancakes', 'Описание', None)):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=10)
+            if ingredient:
+                IngredientsRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1)
+        update_search_vectors()
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            '/api/recipes/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_name_match_first(self):
+        names = self.search('TOMATO')
+        self.assertEqual(names[0], 'Tomato soup')
+        self.assertCountEqual(names, ['Tomato soup', 'Salad', 'Stew'])
+
+    def test_explicit_ordering(self):
+        names = self.search('tomato', ordering='newest')
+        self.assertEqual(names, ['Stew', 'Salad', 'Tomato soup'])
+
+    def test_icontains_fallback(self):
+        if is_supported():
+            self.skipTest(f'полнотекстовый поиск на {connection.vendor}')
+        self.assertCountEqual(
+            self.search('omat'), ['Tomato soup', 'Salad', 'Stew'])
@@ -0,0 +1,53 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipe.models import IngredientsBd
+
+
+class ImportCatalogueTest(TestCase):
+    """Повторная загрузка обновляет единицы и ничего не дублирует."""
+
+    def setUp(self):
+        file, self.path = tempfile.mkstemp(suffix='.csv')
+        os.close(file)
+        self.addCleanup(os.remove, self.path)
+
+    def import_rows(self, *rows, dry_run=False):
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write('name,measurement_unit\n')
+            file.writelines(f'{name},{unit}\n' for name, unit in rows)
+        out = StringIO()
+        call_command('import_catalogue', ingredients=self.path,
+                     dry_run=dry_run, stdout=out)
+        return out.getvalue()
+
+    def get_rows(self):
+        return sorted(IngredientsBd.objects.values_list(
+            'name', 'measurement_unit'))
+
+    def test_reimport(self):
+        rows = [('мука', 'г'), ('соль', 'г'), ('соль', 'щепотка')]
+        self.assertIn('добавлено 3, обновлено 0, без изменений 0',
+                      self.import_rows(*rows))
+        self.assertIn('добавлено 0, обновлено 0, без изменений 3',
+                      self.import_rows(*rows))
+        self.assertEqual(self.get_rows(), sorted(rows))
+
+    def test_unit_change(self):
+        self.import_rows(('мука', 'г'), ('соль', 'г'))
+        flour = IngredientsBd.objects.get(name='мука')
+        rows = [('мука', 'кг'), ('соль', 'г'), ('соль', 'ч. л.')]
+
+        output = self.import_rows(*rows, dry_run=True)
+        self.assertIn("~ мука: 'г' -> 'кг'", output)
+        self.assertIn('добавлено 1, обновлено 1, без изменений 1', output)
+        self.assertEqual(self.get_rows(), [('мука', 'г'), ('соль', 'г')])
+
+        self.import_rows(*rows)
+        self.assertEqual(self.get_rows(), sorted(rows))
+        flour.refresh_from_db()
+        self.assertEqual(flour.measurement_unit, 'кг')
@@ -0,0 +1,82 @@
+import json
+from base64 import b64encode
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipe.models import Recipe
+from users.models import User
+
+RECIPES = 10
+LIMIT = 3
+
+
+def encode_cursor(data):
+    return b64encode(json.dumps(data).encode()).decode()
+
+
+class RecipeCursorPaginationTest(TestCase):
+    """Курсор проходит все рецепты без повторов, даже при равных значениях
+    поля сортировки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author', password='pass',
+            first_name='Автор', last_name='Тестов')
+        for i in range(RECIPES):
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание',
+                cooking_time=10, favorites_count=i % 2)
+        Recipe.objects.update(pub_date=timezone.now())
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+
+    def walk(self, url, params=None, link='next'):
+        ids, pages = [], []
+        while url:
+            data = self.client.get(url, params).json()
+            params = None
+            pages.append([recipe['id'] for recipe in data['results']])
+            ids.extend(pages[-1])
+            url = data[link]
+        return ids, pages
+
+    def assert_stable(self, ordering, expected):
+        ids, pages = self.walk('/api/recipes/', {
+            'pagination': 'cursor', 'limit': LIMIT, 'ordering': ordering})
+        self.assertEqual(ids, expected)
+        self.assertTrue(all(len(page) <= LIMIT for page in pages))
+
+        # От последней страницы назад - те же страницы в обратном порядке.
+        last = self.client.get('/api/recipes/', {
+            'pagination': 'cursor', 'limit': LIMIT, 'ordering': ordering})
+        while last.json()['next']:
+            last = self.client.get(last.json()['next'])
+        _, backwards = self.walk(last.json()['previous'], link='previous')
+        self.assertEqual(backwards[::-1], pages[:-1])
+
+    def test_newest_with_equal_dates(self):
+        self.assert_stable('newest', list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_popular_with_equal_counts(self):
+        self.assert_stable('popular', list(
+            Recipe.objects.order_by('-favorites_count', '-id').values_list(
+                'id', flat=True)))
+
+    def test_invalid_cursor(self):
+        cursors = (
+            'garbage',
+            encode_cursor({'r': 0}),
+            encode_cursor({'r': 0, 'p': [1]}),
+            encode_cursor({'r': 0, 'p': ['не дата', 1]}),
+        )
+        for cursor in cursors:
+            response = self.client.get('/api/recipes/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
@@ -0,0 +1,69 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipe.models import (FollowRecipes, IngredientsBd, IngredientsRecipe,
+                           Recipe, ShoppingCart, Tag)
+from users.models import FollowAuthor, User
+
+RECIPES = 6
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader', password='pass',
+            first_name='Читатель', last_name='Тестов')
+        authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                password='pass', first_name='Автор', last_name=str(i))
+            for i in range(2)
+        ]
+        tags = [Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                                   slug=f'tag{i}') for i in range(3)]
+        ingredients = [
+            IngredientsBd.objects.create(name=f'Ингредиент {i}',
+                                         measurement_unit='г')
+            for i in range(5)
+        ]
+        for i in range(RECIPES):
+            recipe = Recipe.objects.create(
+                author=authors[i % 2], name=f'Рецепт {i}', text='Описание',
+                cooking_time=10, image=f'recipes/{i}.png')
+            recipe.tags.set(tags[i % 3:i % 3 + 2])
+            for ingredient in ingredients[i % 3:i % 3 + 3]:
+                IngredientsRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=i + 1)
+            if i % 2:
+                FollowRecipes.objects.create(user=cls.user, recipes=recipe)
+            else:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        FollowAuthor.objects.create(user=cls.user, author=authors[0])
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def assert_same_queries(self, client):
+        # Первый запрос заполняет кэши справочников и связей пользователя.
+        client.get('/api/recipes/', {'limit': 2})
+        with CaptureQueriesContext(connection) as full_page:
+            response = client.get('/api/recipes/', {'limit': RECIPES})
+        self.assertEqual(len(response.json()['results']), RECIPES)
+        with self.assertNumQueries(len(full_page)):
+            response = client.get('/api/recipes/', {'limit': 1})
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_anonymous(self):
+        self.assert_same_queries(APIClient())
+
+    def test_authenticated(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assert_same_queries(client)
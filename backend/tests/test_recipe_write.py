@@ -0,0 +1,117 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipe.models import IngredientsBd, IngredientsRecipe, Recipe, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(buffer, format='PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteTest(TestCase):
+    """Создание и правка рецепта через API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author', password='pass',
+            first_name='Автор', last_name='Тестов')
+        cls.tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        cls.ingredients = [
+            IngredientsBd.objects.create(name=f'Ингредиент {i}',
+                                         measurement_unit='г')
+            for i in range(4)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def get_payload(self, ingredients):
+        return {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': make_image(),
+            'tags': [self.tag.id],
+            'ingredients': [{'id': pk, 'amount': amount}
+                            for pk, amount in ingredients],
+        }
+
+    def test_create_returns_fresh_recipes_count(self):
+        for expected in (1, 2):
+            response = self.client.post(
+                '/api/recipes/',
+                self.get_payload([(self.ingredients[0].id, 1)]),
+                format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(
+                response.json()['author']['recipes_count'], expected)
+        self.assertEqual(Recipe.objects.filter(author=self.author).count(), 2)
+
+    def test_ingredient_errors_list_int_ids(self):
+        first = self.ingredients[0].id
+        response = self.client.post(
+            '/api/recipes/',
+            self.get_payload([(first, 1), (first, 2), (9999, 1)]),
+            format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'ingredients': {
+            'duplicates': {'detail': 'Повтор ингридиента.',
+                           'ids': [first]},
+            'not_found': {'detail': 'Такого ингредиента не существует',
+                          'ids': [9999]},
+        }})
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_update_writes_ingredient_diff(self):
+        kept, changed, removed, added = (
+            ingredient.id for ingredient in self.ingredients)
+        response = self.client.post(
+            '/api/recipes/',
+            self.get_payload([(kept, 1), (changed, 2), (removed, 3)]),
+            format='json')
+        self.assertEqual(response.status_code, 201)
+        recipe_id = response.json()['id']
+        rows = IngredientsRecipe.objects.filter(recipe_id=recipe_id)
+        before = {row.ingredient_id: row.id for row in rows}
+
+        response = self.client.patch(
+            f'/api/recipes/{recipe_id}/',
+            self.get_payload([(kept, 1), (changed, 5), (added, 4)]),
+            format='json')
+        self.assertEqual(response.status_code, 200)
+        after = {row.ingredient_id: (row.id, row.amount)
+                 for row in rows.all()}
+        self.assertEqual(set(after), {kept, changed, added})
+        self.assertEqual(after[kept], (before[kept], 1))
+        self.assertEqual(after[changed], (before[changed], 5))
+        self.assertEqual(after[added][1], 4)
+        self.assertNotIn(after[added][0], before.values())
+        self.assertFalse(IngredientsRecipe.objects.filter(
+            id=before[removed]).exists())
+        self.assertEqual(
+            sorted((item['id'], item['amount'])
+                   for item in response.json()['ingredients']),
+            sorted([(kept, 1), (changed, 5), (added, 4)]))
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from recipe.models import (IngredientsBd, IngredientsRecipe, Recipe,
+                           ShoppingCart)
+from users.models import User
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListConditionalTest(TestCase):
+    """Условные запросы списка покупок: 304 только для той же корзины."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader', password='pass',
+            first_name='Читатель', last_name='Тестов')
+        ingredient = IngredientsBd.objects.create(
+            name='Мука', measurement_unit='г')
+        cls.recipes = []
+        for i in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {i}', text='Описание',
+                cooking_time=10)
+            IngredientsRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100)
+            cls.recipes.append(recipe)
+        # Второй рецепт старше первого: максимум дат правки не сдвинется.
+        Recipe.objects.filter(id=cls.recipes[1].id).update(
+            updated=timezone.now() - timedelta(days=30))
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[0])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, **headers):
+        response = self.client.get(URL, **headers)
+        if response.status_code == 200:
+            response.body = b''.join(response.streaming_content).decode()
+        return response
+
+    def test_cart_change_after_not_modified(self):
+        first = self.download()
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Last-Modified', first)
+        self.assertIn('- Мука (г) - 100', first.body)
+
+        self.assertEqual(
+            self.download(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipes[1])
+        second = self.download(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertIn('- Мука (г) - 200', second.body)
+
+    def test_if_modified_since_alone(self):
+        response = self.download(HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_follows_date(self):
+        etag = self.download()['ETag']
+        tomorrow = datetime.today() + timedelta(days=1)
+        with mock.patch('api.shopping_list.datetime') as mocked:
+            mocked.today.return_value = tomorrow
+            response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'{tomorrow:%Y-%m-%d}', response.body)
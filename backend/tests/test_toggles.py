@@ -0,0 +1,152 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+
+from recipe.models import FollowRecipes, Recipe, ShoppingCart
+from users.models import FollowAuthor, User
+
+THREADS = 8
+
+
+class ConcurrentToggleTest(TransactionTestCase):
+    """Одновременные одинаковые запросы: без 500, дублей и сбоя счётчиков."""
+
+    def setUp(self):
+        # База SQLite в памяти отвечает на одновременную запись ошибкой
+        # "table is locked"; в CI тесты идут на PostgreSQL.
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('SQLite в памяти не допускает одновременной записи')
+        self.user = User.objects.create_user(
+            email='reader@example.com', username='reader', password='pass',
+            first_name='Читатель', last_name='Тестов')
+        self.author = User.objects.create_user(
+            email='author@example.com', username='author', password='pass',
+            first_name='Автор', last_name='Тестов')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=10)
+
+    def send_concurrently(self, method, url):
+        barrier = threading.Barrier(THREADS)
+
+        def send(_):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                return getattr(client, method)(url).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            return sorted(pool.map(send, range(THREADS)))
+
+    def assert_toggle(self, url, rows, counter, obj):
+        statuses = self.send_concurrently('post', url)
+        self.assertEqual(statuses, [201] + [400] * (THREADS - 1))
+        self.assertEqual(rows.count(), 1)
+        obj.refresh_from_db()
+        self.assertEqual(getattr(obj, counter), 1)
+
+        statuses = self.send_concurrently('delete', url)
+        self.assertEqual(statuses.count(204), 1)
+        self.assertNotIn(500, statuses)
+        self.assertEqual(rows.count(), 0)
+        obj.refresh_from_db()
+        self.assertEqual(getattr(obj, counter), 0)
+
+    def test_favorite(self):
+        self.assert_toggle(
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            FollowRecipes.objects.filter(user=self.user),
+            'favorites_count', self.recipe)
+
+    def test_shopping_cart(self):
+        self.assert_toggle(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            ShoppingCart.objects.filter(user=self.user),
+            'in_carts_count', self.recipe)
+
+    def test_subscribe(self):
+        self.assert_toggle(
+            f'/api/users/{self.author.id}/subscribe/',
+            FollowAuthor.objects.filter(user=self.user),
+            'followers_count', self.author)
+
+
+class BulkToggleTest(TestCase):
+    """Пакетные запросы: статус по каждому id и верные счётчики."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader', password='pass',
+            first_name='Читатель', last_name='Тестов')
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                password='pass', first_name='Автор', last_name=str(i))
+            for i in range(2)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.authors[0], name=f'Рецепт {i}', text='Описание',
+                cooking_time=10)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def send(self, method, url, ids):
+        response = getattr(self.client, method)(
+            url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return {item['id']: item['status']
+                for item in response.json()['results']}
+
+    def assert_bulk(self, url, rows, field, targets, counter, missing):
+        existing, new = targets
+        self.send('post', url, [existing.id])
+        self.assertEqual(
+            self.send('post', url, [existing.id, new.id, missing]),
+            {existing.id: 'exists', new.id: 'added', missing: 'not_found'})
+        self.assertCountEqual(
+            rows.values_list(field, flat=True), [existing.id, new.id])
+        for obj in targets:
+            obj.refresh_from_db()
+            self.assertEqual(getattr(obj, counter), 1)
+
+        self.assertEqual(
+            self.send('delete', url, [new.id, missing]),
+            {new.id: 'removed', missing: 'not_found'})
+        self.assertCountEqual(
+            rows.values_list(field, flat=True), [existing.id])
+        new.refresh_from_db()
+        self.assertEqual(getattr(new, counter), 0)
+
+    def test_favorite(self):
+        self.assert_bulk(
+            '/api/recipes/favorite/',
+            FollowRecipes.objects.filter(user=self.user), 'recipes_id',
+            self.recipes[:2], 'favorites_count', 9999)
+
+    def test_shopping_cart(self):
+        self.assert_bulk(
+            '/api/recipes/shopping_cart/',
+            ShoppingCart.objects.filter(user=self.user), 'recipe_id',
+            self.recipes[:2], 'in_carts_count', 9999)
+
+    def test_subscribe(self):
+        # Подписка на себя недоступна, как и на несуществующего автора.
+        self.assert_bulk(
+            '/api/users/subscribe/',
+            FollowAuthor.objects.filter(user=self.user), 'author_id',
+            self.authors, 'followers_count', self.user.id)
@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_auto_20231020_2312'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='followauthor',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+    ]
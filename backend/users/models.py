@@ -63,6 +63,18 @@ class User(AbstractUser):
         default='user',
         help_text='Выберите роль пользователя',
     )
+
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Число рецептов',
+        default=0,
+        editable=False,
+    )
+
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0,
+        editable=False,
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
@@ -103,5 +115,9 @@ class FollowAuthor(models.Model):
                 name='unique_follow'
             )
         ]
+        indexes = [
+            models.Index(fields=('author', 'user'),
+                         name='follow_author_user_idx'),
+        ]
         verbose_name = 'Подписка на автора'
         verbose_name_plural = 'Подписка на автора'
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api.executor import async_patterns
 from .views import CustomUserViewSet
 
 app_name = 'users'
@@ -10,7 +11,7 @@ router = DefaultRouter()
 router.register('users', CustomUserViewSet)
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(async_patterns(router.urls))),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,13 +1,22 @@
 from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
+from rest_framework.settings import api_settings
 
 
-from api.serializers import CustomUserSerializer, FollowAuthorSerializer
+from api.pagination import SubscriptionPagination
+from api.serializers import (ALREADY_SUBSCRIBED, BulkIdsSerializer,
+                             CustomUserSerializer, FollowAuthorSerializer,
+                             get_recipes_limit)
+from api.toggles import add_relation, bulk_toggle, remove_relation
+from recipe.models import Recipe
 from .models import FollowAuthor
 
 User = get_user_model()
@@ -16,6 +25,7 @@ User = get_user_model()
 class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
+    lookup_value_regex = r'\d+'
 
     def get_permissions(self):
         if self.action == 'me':
@@ -29,30 +39,62 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscribe(self, request, id):
         user = request.user
-        author = get_object_or_404(User, id=id)
 
         if request.method == 'POST':
+            author = get_object_or_404(User, id=id)
             serializer = FollowAuthorSerializer(author,
                                                 data=request.data,
                                                 context={'request': request})
             serializer.is_valid(raise_exception=True)
-            FollowAuthor.objects.create(user=user, author=author)
+            if not add_relation(FollowAuthor, user, author=author):
+                raise ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [ALREADY_SUBSCRIBED]
+                })
+            # Счётчики изменены через F() в базе, а не в загруженном author.
+            author.refresh_from_db(fields=('followers_count', 'recipes_count'))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            subscription = get_object_or_404(FollowAuthor,
-                                             user=user,
-                                             author=author)
-            subscription.delete()
+            if not remove_relation(FollowAuthor, user, author=id):
+                raise Http404
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
+        methods=['post', 'delete'],
         detail=False,
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        url_path='subscribe',
+        url_name='subscribe-bulk',
+    )
+    def subscribe_bulk(self, request):
+        """Подписка на нескольких авторов или отписка одним запросом."""
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'results': bulk_toggle(
+            request.method, FollowAuthor, request.user, 'author',
+            serializer.validated_data['ids'],
+            User.objects.exclude(id=request.user.id)
+        )})
+
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=SubscriptionPagination
     )
     def subscriptions(self, request):
+        """Подписки с числом рецептов и последними рецептами авторов."""
         user = request.user
-        queryset = User.objects.filter(following__user=user)
+        recipes = Recipe.objects.prefetch_related('renditions')
+        limit = get_recipes_limit(request)
+        if limit:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date', '-id').values('id')[:limit]
+            ))
+        queryset = User.objects.filter(following__user=user).prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        ).order_by('id')
         pages = self.paginate_queryset(queryset)
         serializer = FollowAuthorSerializer(pages,
                                             many=True,